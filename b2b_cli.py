@@ -0,0 +1,177 @@
+# b2b_cli.py
+# The import, Estrapola Dati exports and Excel reports of the app, without the GUI, for
+# scheduled jobs on the machine that holds the database:
+#
+#   python -m b2b_cli [--db app_database.db] [--json] import FILE
+#   python -m b2b_cli export {all,open,flotta,flotta_consegnata} [--flotta F] [--format xlsx] [--output DIR]
+#   python -m b2b_cli stato-report [--flotta F] [--output DIR]
+#   python -m b2b_cli notifications-report [--search TEXT] [--output DIR]
+#   python -m b2b_cli recompute [--flotta F | --ids ID [ID ...]]
+#   python -m b2b_cli batch-reports [--flotte F [F ...]] [--reports {stato,notifications} ...] [--workers N] [--output DIR]
+#
+# Nothing here imports PyQt5. Each run prints what it did and how long it took, as one JSON
+# object with --json, and exits with one of the EXIT_ codes below.
+import argparse
+import json
+import sys
+import time
+
+import queries
+from batch_reports import REPORTS, write_batch_reports
+from dashboard_data import fetch_notifications
+from derived_fields import recompute_derived_fields
+from db_connections import DB_PATH, connect
+from db_schema import ensure_schema
+from records_store import import_file
+from reports import write_notifications_report, write_stato_report
+from streaming_export import EXPORT_FORMATS, export_file_name, export_query
+
+EXIT_OK = 0
+# Nothing to import, export or report
+EXIT_NO_DATA = 1
+# Bad arguments (argparse's own code)
+EXIT_USAGE = 2
+# Import done, but some rows were rejected
+EXIT_REJECTED = 3
+EXIT_FAILED = 4
+
+
+def run_import(conn, args):
+    result = import_file(conn, args.file)
+    summary = {
+        'imported': result['imported'],
+        'rejected': result['rejected'],
+        'rejected_file': result['rejected_file'],
+    }
+    if not result['columns']:
+        summary['error'] = 'Nessuna colonna corrisponde ai dati richiesti.'
+        return EXIT_NO_DATA, summary
+    return (EXIT_REJECTED if result['rejected'] else EXIT_OK), summary
+
+
+def run_export(conn, args):
+    flotta = args.flotta.upper() if args.flotta else None
+    params = [flotta] if flotta else []
+    file_path = f'{args.output}/{export_file_name(args.name, flotta)}.{args.format}'
+    exported = export_query(conn, queries.EXPORTS[args.name], params, file_path)
+    if not exported:
+        return EXIT_NO_DATA, {'exported': 0, 'file': None}
+    return EXIT_OK, {'exported': exported, 'file': file_path}
+
+
+def run_stato_report(conn, args):
+    flotta_filter = (args.flotta or '').upper().strip() or 'Flotta_All'
+    return EXIT_OK, {'file': write_stato_report(conn, flotta_filter, folder=args.output)}
+
+
+def run_notifications_report(conn, args):
+    notifications = fetch_notifications(conn, args.search.upper().strip())
+    if notifications.empty:
+        return EXIT_NO_DATA, {'notifications': 0, 'file': None}
+    file_path = write_notifications_report(notifications, args.search, folder=args.output)
+    return EXIT_OK, {'notifications': len(notifications), 'file': file_path}
+
+
+def run_batch_reports(conn, args):
+    folder, results = write_batch_reports(args.db, args.flotte, args.reports, folder=args.output, workers=args.workers)
+    summary = {
+        'folder': folder,
+        'flotte': len(results),
+        'files': sum(len(result.get('files', [])) for result in results.values()),
+        'failed': {flotta: result['error'] for flotta, result in results.items() if 'error' in result},
+    }
+    if summary['failed']:
+        return EXIT_FAILED, summary
+    return (EXIT_OK if results else EXIT_NO_DATA), summary
+
+
+def run_recompute(conn, args):
+    flotta = args.flotta.upper() if args.flotta else None
+    result = recompute_derived_fields(conn, ids=args.ids, flotta=flotta)
+    conn.commit()
+    if not result['records']:
+        return EXIT_NO_DATA, result
+    return EXIT_OK, result
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m b2b_cli', description='DataBaseB2B senza interfaccia grafica')
+    parser.add_argument('--db', default=DB_PATH, help='database file (default: %(default)s)')
+    parser.add_argument('--json', action='store_true', help='print the outcome as one JSON object')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('import', help='import an .xlsx or .csv file')
+    command.add_argument('file')
+    command.set_defaults(run=run_import)
+
+    command = commands.add_parser('export', help='Estrapola Dati export')
+    command.add_argument('name', choices=list(queries.EXPORTS))
+    command.add_argument('--flotta', help="required by the 'flotta' exports")
+    command.add_argument('--format', choices=list(EXPORT_FORMATS), default='xlsx')
+    command.add_argument('--output', default='.', help='destination folder')
+    command.set_defaults(run=run_export)
+
+    command = commands.add_parser('stato-report', help='Stato Lavorazioni report')
+    command.add_argument('--flotta', help='all flotte if not given')
+    command.add_argument('--output', default='.', help='folder the report folder is created in')
+    command.set_defaults(run=run_stato_report)
+
+    command = commands.add_parser('notifications-report', help='Notifiche report')
+    command.add_argument('--search', default='', help='same filter as the Notifiche search box')
+    command.add_argument('--output', default='.', help='destination folder')
+    command.set_defaults(run=run_notifications_report)
+
+    command = commands.add_parser('batch-reports', help='Stato Lavorazioni and Notifiche reports of every flotta')
+    command.add_argument('--flotte', nargs='+', metavar='F', help='these flotte only')
+    command.add_argument('--reports', nargs='+', choices=REPORTS, default=REPORTS)
+    command.add_argument('--workers', type=int, help='worker processes (default: one per CPU core)')
+    command.add_argument('--output', default='.', help='folder the dated report folder is created in')
+    command.set_defaults(run=run_batch_reports)
+
+    command = commands.add_parser('recompute', help='recompute the working-day fields derived from the dates')
+    selection = command.add_mutually_exclusive_group()
+    selection.add_argument('--flotta', help='only the records of this flotta')
+    selection.add_argument('--ids', type=int, nargs='+', metavar='ID', help='only these records')
+    command.set_defaults(run=run_recompute)
+    return parser
+
+
+def print_summary(summary, as_json):
+    if as_json:
+        print(json.dumps(summary, ensure_ascii=False))
+        return
+    for key, value in summary.items():
+        print(f'{key}: {value}')
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'export' and args.name.startswith('flotta') and not args.flotta:
+        parser.error(f'{args.name} needs --flotta')
+
+    start = time.perf_counter()
+    summary = {'command': args.command}
+    conn = None
+    try:
+        conn = connect(args.db)
+        # Also moves the records_aging ages on to today, which the reports read
+        ensure_schema(conn)
+        summary['schema_s'] = round(time.perf_counter() - start, 3)
+        exit_code, result = args.run(conn, args)
+        summary.update(result)
+    except Exception as e:
+        exit_code = EXIT_FAILED
+        summary['error'] = f'{type(e).__name__}: {e}'
+    finally:
+        if conn is not None:
+            conn.close()
+
+    summary['exit_code'] = exit_code
+    summary['elapsed_s'] = round(time.perf_counter() - start, 3)
+    print_summary(summary, args.json)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
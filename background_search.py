@@ -0,0 +1,57 @@
+# background_search.py
+# Debounced search for the filter boxes of the Notifiche and Stato Lavorazioni tabs.
+#
+# Keystrokes restart a short timer; when typing pauses, the query runs on the database
+# executor's reader threads. A newer search cancels or interrupts the one still in flight
+# and the results of any superseded search are dropped, so only the latest result set
+# reaches the view.
+from PyQt5.QtCore import QObject, QTimer
+
+
+class DebouncedSearch(QObject):
+    def __init__(self, executor, fetch, apply, error_handler=None, delay_ms=250, parent=None):
+        """Run fetch(conn, search_text) on the executor and hand the latest result to apply(result)."""
+        super().__init__(parent)
+        self.executor = executor
+        self.fetch = fetch
+        self.apply = apply
+        self.error_handler = error_handler
+        self.generation = 0
+        self.pending_text = ''
+        self.future = None
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(delay_ms)
+        self.timer.timeout.connect(self.start)
+
+    def request(self, search_text):
+        """Schedule a search once typing pauses for delay_ms."""
+        self.pending_text = search_text
+        self.timer.start()
+
+    def run_now(self, search_text):
+        """Search immediately, superseding any pending or running search."""
+        self.pending_text = search_text
+        self.timer.stop()
+        self.start()
+
+    def start(self):
+        self.generation += 1
+        generation = self.generation
+        if self.future is not None and not self.future.done():
+            self.executor.cancel(self.future)
+        self.future = self.executor.submit(
+            self.fetch, self.pending_text,
+            callback=lambda result: self.on_finished(generation, result),
+            error_callback=lambda error: self.on_failed(generation, error)
+        )
+
+    def on_finished(self, generation, result):
+        if generation == self.generation:
+            self.apply(result)
+
+    def on_failed(self, generation, error):
+        # A superseded search ends with an "interrupted" error: only report the current one
+        if generation == self.generation and self.error_handler:
+            self.error_handler(str(error))
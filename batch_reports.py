@@ -0,0 +1,110 @@
+# batch_reports.py
+# The Stato Lavorazioni and Notifiche reports of every flotta (or of a list of them) in one
+# job, the same workbooks as typing each flotta in the tab's search box and exporting:
+#
+#   python -m b2b_cli batch-reports [--flotte F ...] [--reports stato notifications] [--workers N]
+#
+# The flotte are shared out over a pool of worker processes, the largest first so that the
+# last ones to start are quick. Each worker opens one read-only connection and writes the
+# reports of a flotta inside one read transaction, so that both come from the same snapshot
+# of the database while records keep being saved. The workbooks all go in one folder named
+# after the day. Nothing here imports PyQt5.
+#
+# Unlike the tabs' search, a flotta's reports hold exactly its records: a flotta is every
+# stored spelling with the same flotta_key ('MIRAUTO' and 'MIRAUTO ' are one flotta, with
+# one workbook of each report), and no other flotta whose name contains it.
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import queries
+from db_connections import connect
+from reports import dated_folder
+
+REPORTS = ['stato', 'notifications']
+BATCH_FOLDER = 'Report_flotte'
+
+
+class Worker:
+    # The connection of a worker process, opened once by open_connection
+    conn = None
+
+
+def open_connection(db_path):
+    Worker.conn = connect(db_path, read_only=True)
+
+
+def flotta_key(flotta):
+    """The name a flotta is reported under: spellings differing in case or surrounding spaces are one flotta."""
+    return flotta.strip().upper()
+
+
+def flotta_reports(flotta, flotta_names, reports, folder):
+    """Write the reports of one flotta (the records of flotta_names) from one snapshot; returns the workbook paths."""
+    # pandas and openpyxl are only loaded in the worker processes
+    from dashboard_data import fetch_flotta_notifications
+    from reports import write_notifications_report, write_stato_report
+
+    conn = Worker.conn
+    files = []
+    conn.execute('BEGIN')
+    try:
+        if 'stato' in reports:
+            files.append(write_stato_report(conn, flotta, folder, in_dated_folder=False, flotta_names=flotta_names))
+        if 'notifications' in reports:
+            notifications = fetch_flotta_notifications(conn, flotta_names)
+            if not notifications.empty:
+                files.append(write_notifications_report(notifications, flotta, folder=folder))
+    finally:
+        conn.rollback()
+    return files
+
+
+def flotta_sizes(db_path):
+    """Stored spellings and records of every flotta by flotta_key, from the records_counts table.
+
+    Returns {flotta: {'names': [...], 'records': n}}.
+    """
+    conn = connect(db_path, read_only=True)
+    try:
+        sizes = {}
+        for name, _, count in conn.execute(queries.COUNTS_BY_DIMENSION, ('flotta',)):
+            if name and flotta_key(name):
+                size = sizes.setdefault(flotta_key(name), {'names': [], 'records': 0})
+                size['names'].append(name)
+                size['records'] += count
+        return sizes
+    finally:
+        conn.close()
+
+
+def write_batch_reports(db_path, flotte=None, reports=REPORTS, folder=None, workers=None):
+    """Write the reports of flotte (every flotta by default) over a pool of worker processes.
+
+    Returns the dated folder they are in, and {flotta: {'files': [...]} or {'error': ...}} by
+    flotta_key, in the order the flotte were started in; a flotta that fails does not stop
+    the others.
+    """
+    sizes = flotta_sizes(db_path)
+    # A flotta with no records still gets its (empty) Stato workbook
+    for flotta in flotte or []:
+        sizes.setdefault(flotta_key(flotta), {'names': [flotta_key(flotta)], 'records': 0})
+    flotte = sorted({flotta_key(flotta) for flotta in flotte} if flotte else sizes,
+                    key=lambda flotta: (-sizes[flotta]['records'], flotta))
+    folder_path = dated_folder(BATCH_FOLDER, folder)
+    if not flotte:
+        return folder_path, {}
+
+    results = {}
+    # Spawned rather than forked, so that no worker inherits the caller's open connections and threads
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(flotte)),
+                             mp_context=multiprocessing.get_context('spawn'),
+                             initializer=open_connection, initargs=(db_path,)) as pool:
+        futures = {pool.submit(flotta_reports, flotta, sizes[flotta]['names'], reports, folder_path): flotta
+                   for flotta in flotte}
+        for future in as_completed(futures):
+            try:
+                results[futures[future]] = {'files': future.result()}
+            except Exception as e:
+                results[futures[future]] = {'error': f'{type(e).__name__}: {e}'}
+    return folder_path, {flotta: results[flotta] for flotta in flotte}
@@ -0,0 +1,2 @@
+# benchmarks
+# Timed scenarios of the app on synthetic fleet data, see __main__.py.
@@ -0,0 +1,115 @@
+# benchmarks/__main__.py
+# Times the app's heavy operations on synthetic fleet data:
+#
+#   python -m benchmarks [--sizes 10k 100k 1m] [--repeat 3] [--scenarios NAME ...] [--output FILE]
+#
+# The data sets are generated on first use (see fleet_data.py) and kept in benchmarks/data
+# for the following runs. Qt runs on the offscreen platform. The results are written as one
+# JSON file, to compare two versions with python -m benchmarks.compare OLD.json NEW.json.
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime
+
+# Before PyQt5 is imported by the scenarios
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication
+
+from benchmarks.fleet_data import SEED, SIZES, fleet_files
+from benchmarks.scenarios import SCENARIOS, Bench
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCHMARKS_DIR, 'data')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARKS_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def time_scenario(bench, scenario, repeat):
+    """Set the scenario up and run it repeat times; its timings in seconds and what its last run returned."""
+    run = scenario(bench)
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        timings.append(time.perf_counter() - start)
+    return {
+        'runs_s': [round(timing, 4) for timing in timings],
+        'min_s': round(min(timings), 4),
+        'median_s': round(statistics.median(timings), 4),
+        'mean_s': round(statistics.mean(timings), 4),
+        'result': result,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='DataBaseB2B benchmarks')
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES), default=['10k'],
+                        help='records in the generated data sets (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs of every scenario (default: %(default)s)')
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS),
+                        metavar='NAME', help=f'scenarios to run (default: all of {", ".join(SCENARIOS)})')
+    parser.add_argument('--seed', type=int, default=SEED, help='seed of the generated data (default: %(default)s)')
+    parser.add_argument('--anchor', type=date.fromisoformat, default=date.today(),
+                        help='"today" of the generated data, YYYY-MM-DD (default: today)')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<time>_<commit>.json)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    app = QApplication(sys.argv[:1])
+    commit = git_commit()
+    output = args.output or os.path.join(
+        BENCHMARKS_DIR, 'results', f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{commit or 'nogit'}.json")
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'anchor': args.anchor.isoformat(),
+        'repeat': args.repeat,
+        'results': [],
+    }
+    for size in args.sizes:
+        rows = SIZES[size]
+        start = time.perf_counter()
+        csv_path, db_path = fleet_files(DATA_DIR, rows, args.seed, args.anchor)
+        print(f'{size}: data set ready in {time.perf_counter() - start:.1f} s', file=sys.stderr)
+
+        bench = Bench(csv_path, db_path, os.path.join(DATA_DIR, f'work_{rows}'), args.seed)
+        try:
+            for name in args.scenarios:
+                timing = time_scenario(bench, SCENARIOS[name], args.repeat)
+                report['results'].append({'size': size, 'rows': rows, 'scenario': name, **timing})
+                print(f'{size:>5}  {name:<24} median {timing["median_s"]:9.4f} s  min {timing["min_s"]:9.4f} s',
+                      file=sys.stderr)
+        finally:
+            bench.close()
+        app.processEvents()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+# benchmarks/compare.py
+# Compare two results files of python -m benchmarks, scenario by scenario:
+#
+#   python -m benchmarks.compare OLD.json NEW.json
+#
+# prints the median of both runs and the speedup (old / new, above 1 when NEW is faster),
+# and flags the scenarios whose result differs, i.e. that did not do the same work.
+import argparse
+import json
+import sys
+
+
+def load_results(file_path):
+    with open(file_path, encoding='utf-8') as f:
+        report = json.load(f)
+    return report, {(entry['size'], entry['scenario']): entry for entry in report['results']}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.compare')
+    parser.add_argument('old')
+    parser.add_argument('new')
+    args = parser.parse_args(argv)
+
+    old_report, old = load_results(args.old)
+    new_report, new = load_results(args.new)
+    print(f'old: {old_report["commit"]} ({old_report["created"]})   new: {new_report["commit"]} ({new_report["created"]})')
+    print(f'{"size":>5}  {"scenario":<24} {"old s":>9} {"new s":>9} {"speedup":>8}')
+    for key in new:
+        if key not in old:
+            continue
+        size, scenario = key
+        old_median, new_median = old[key]['median_s'], new[key]['median_s']
+        speedup = f'{old_median / new_median:7.2f}x' if new_median else '      -'
+        same = '' if old[key]['result'] == new[key]['result'] else '  (different result)'
+        print(f'{size:>5}  {scenario:<24} {old_median:9.4f} {new_median:9.4f} {speedup}{same}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
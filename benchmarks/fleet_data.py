@@ -0,0 +1,212 @@
+# benchmarks/fleet_data.py
+# Deterministic synthetic records, shaped like the real ones: weighted flotte, modelli and
+# ditte, Italian targhe (some vehicles come back for a second repair), more recent entries
+# than old ones, most records delivered and the open ones spread over the work stati.
+#
+# The same rows, seed and anchor date always give the same file. Dates are laid out going
+# back from the anchor date, the "today" of the data, so that the ages of the open records
+# look like the office's whatever day the benchmark runs.
+import csv
+import os
+import random
+from datetime import date, timedelta
+
+from bulk_import import IMPORT_COLUMNS, import_records
+from db_connections import connect
+from db_schema import ensure_schema
+from working_days import DATE_FORMAT
+
+SEED = 2024
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+# Days of history before the anchor date; recent days get more entries
+HISTORY_DAYS = 4 * 365
+# Share of the records that are a vehicle already seen, back for another repair
+RETURN_RATE = 0.08
+# Italian targhe do not use I, O, Q and U
+PLATE_LETTERS = 'ABCDEFGHJKLMNPRSTVWXYZ'
+PLATE_SPACE = len(PLATE_LETTERS) ** 4 * 1000
+# Coprime with PLATE_SPACE: index * PLATE_STEP walks every targa once, in a scattered order
+PLATE_STEP = 179_424_673
+
+FLOTTE = {
+    'CSN': 30, 'DRIVALIA': 22, 'MIRAUTO': 10, 'ALD': 9, 'LEASYS': 8, 'ARVAL': 7,
+    'AYVENS': 5, 'FLEXAUTO': 4, 'LEASEPLAN': 3, 'HERTZ': 2,
+}
+MODELLI = {
+    'QASHQAI': 13, 'COMPASS': 8, 'PUMA': 5, 'PANDA': 5, 'I10': 5, 'TONALE': 4, 'C-HR': 4,
+    'JUKE': 3, 'DR4': 3, 'CORSA': 3, '500': 3, '208': 3, 'ZS': 2, 'YARIS': 2, 'X2': 2,
+    'T-ROC': 2, 'KUGA': 2, 'CLIO': 2, 'C3': 2, '500X': 2, '500E': 2, 'YPSILON': 1,
+    'YARIS CROSS': 1, 'X-TRAIL': 1, 'CAPTUR': 1, 'GOLF': 1, 'TIGUAN': 1, 'SPORTAGE': 1,
+}
+DITTE = {'PIBO': 24, 'HPS': 18, 'B2C': 11, 'EUSY': 6, 'TOR': 2, 'HPSV': 1, 'APPRONTAMENTO': 1}
+# Stato of the records not delivered yet
+OPEN_STATI = {
+    'Attesa Perizia': 4, 'Attesa Autorizzazione': 21, 'Attesa Ricambi': 12,
+    'Lavorazione Carr.': 27, 'Lavorazione Mecc.': 6, 'Casa Madre': 1, 'Altri Lavori': 1, 'Pronta': 4,
+}
+NOTES = [
+    'VETTURA DA SMONTARE PER PREVENTIVO COMPLETO E DEFINITIVO IN {ditta} ({day})',
+    'ATTESA AUTORIZZAZIONE PER PASTIGLIE POST. {day}',
+    'INTEGRAZIONE EFFETTUATA PER CAMBIO PARAF. ANT. DX. ({day})',
+    'CONSEGNATA {day} - AGG. VULKAN',
+    'CHIUSA E FATT. VULKAN',
+    'APPRONTAMENTO LAVAGGIO {day}',
+    'CAMBIO BATTERIA',
+    'FINITA',
+]
+
+
+def plate(index):
+    """The index-th targa, in the current 'AB123CD' format; different indexes give different targhe."""
+    n = (index * PLATE_STEP + 12345) % PLATE_SPACE
+    n, digits = divmod(n, 1000)
+    letters = []
+    for _ in range(4):
+        n, letter = divmod(n, len(PLATE_LETTERS))
+        letters.append(PLATE_LETTERS[letter])
+    return f'{letters[0]}{letters[1]}{digits:03d}{letters[2]}{letters[3]}'
+
+
+def weighted(rng, choices):
+    """A sampler of the keys of choices, each drawn in proportion to its weight."""
+    population = list(choices)
+    cum_weights = []
+    total = 0
+    for weight in choices.values():
+        total += weight
+        cum_weights.append(total)
+    return lambda: rng.choices(population, cum_weights=cum_weights)[0]
+
+
+def weekday_on_or_after(day):
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+def generate_records(rows, seed=SEED, anchor=None):
+    """Yield rows records as lists of IMPORT_COLUMNS values, 'dd/mm/yyyy' dates, oldest entrata first."""
+    anchor = anchor or date.today()
+    rng = random.Random(seed)
+    flotta = weighted(rng, FLOTTE)
+    modello = weighted(rng, MODELLI)
+    ditta = weighted(rng, DITTE)
+    open_stato = weighted(rng, OPEN_STATI)
+    first_day = anchor - timedelta(days=HISTORY_DAYS)
+    day_strings = {}
+
+    def text(day):
+        if day is None:
+            return ''
+        if day not in day_strings:
+            day_strings[day] = day.strftime(DATE_FORMAT)
+        return day_strings[day]
+
+    # Weighted towards the anchor: the office handles more cars every year
+    offsets = sorted(int(rng.triangular(0, HISTORY_DAYS, HISTORY_DAYS)) for _ in range(rows))
+    vehicles = []       # (targa, flotta, modello) of the vehicles seen so far
+    last_entrata = {}   # targa -> latest entrata
+    for index, offset in enumerate(offsets):
+        # Entries fall on working days, never after the anchor date
+        entrata = min(anchor, weekday_on_or_after(first_day + timedelta(days=offset)))
+        vehicle = None
+        if vehicles and rng.random() < RETURN_RATE:
+            vehicle = vehicles[rng.randrange(len(vehicles))]
+            if last_entrata[vehicle[0]] >= entrata:
+                vehicle = None
+        if vehicle is None:
+            vehicle = (plate(index), flotta(), modello())
+            vehicles.append(vehicle)
+        last_entrata[vehicle[0]] = entrata
+
+        data_incarico = min(anchor, weekday_on_or_after(entrata + timedelta(days=int(rng.expovariate(1 / 6)))))
+
+        # Older incarichi are more likely to be delivered; a few stay open for a long time
+        age = (anchor - data_incarico).days
+        delivered = rng.random() < min(0.985, age / 40)
+        inizio_mecc = fine_mecc = inizio_carr = fine_carr = data_consegnata = None
+        pezzi_carr = ''
+        work_ditta = ''
+        if delivered:
+            stato = 'Consegnata'
+            data_consegnata = min(anchor, weekday_on_or_after(
+                data_incarico + timedelta(days=1 + int(rng.expovariate(1 / 12)))))
+            span = (data_consegnata - data_incarico).days
+            if rng.random() < 0.45:
+                inizio_mecc = data_incarico + timedelta(days=rng.randint(0, span))
+                fine_mecc = inizio_mecc + timedelta(days=rng.randint(0, (data_consegnata - inizio_mecc).days))
+            if rng.random() < 0.55:
+                inizio_carr = data_incarico + timedelta(days=rng.randint(0, span))
+                fine_carr = inizio_carr + timedelta(days=rng.randint(0, (data_consegnata - inizio_carr).days))
+                work_ditta = ditta()
+            # The real data often leaves the delivery date empty
+            if rng.random() < 0.4:
+                data_consegnata = None
+        else:
+            stato = open_stato()
+            if stato == 'Lavorazione Carr.':
+                inizio_carr = data_incarico + timedelta(days=rng.randint(0, age))
+                work_ditta = ditta()
+            elif stato == 'Lavorazione Mecc.':
+                inizio_mecc = data_incarico + timedelta(days=rng.randint(0, age))
+            elif stato == 'Pronta' and rng.random() < 0.5:
+                inizio_carr = data_incarico + timedelta(days=rng.randint(0, age))
+                fine_carr = inizio_carr + timedelta(days=rng.randint(0, (anchor - inizio_carr).days))
+                work_ditta = ditta()
+        if inizio_carr is not None or rng.random() < 0.5:
+            pezzi_carr = str(rng.randint(0, 12))
+        note = ''
+        if rng.random() < 0.6:
+            note = rng.choice(NOTES).format(ditta=work_ditta or 'B2C', day=text(data_consegnata or data_incarico))
+
+        targa, vehicle_flotta, vehicle_modello = vehicle
+        yield [
+            vehicle_flotta, targa, vehicle_modello, text(entrata), text(data_incarico),
+            work_ditta, text(inizio_mecc), text(fine_mecc), text(inizio_carr), text(fine_carr),
+            pezzi_carr, stato, note, text(data_consegnata),
+        ]
+
+
+def write_csv(file_path, rows, seed=SEED, anchor=None):
+    """Write the generated records to a CSV file with the IMPORT_COLUMNS headers, as exported by the app."""
+    temp_path = file_path + '.part'
+    with open(temp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(IMPORT_COLUMNS)
+        writer.writerows(generate_records(rows, seed, anchor))
+    os.replace(temp_path, file_path)
+    return file_path
+
+
+def build_database(db_path, csv_path):
+    """Create db_path with the app's schema and the records of csv_path, through the app's import."""
+    temp_path = db_path + '.part'
+    for path in (temp_path, temp_path + '-wal', temp_path + '-shm'):
+        if os.path.exists(path):
+            os.remove(path)
+    conn = connect(temp_path)
+    try:
+        ensure_schema(conn)
+        result = import_records(conn, csv_path)
+        if result['rejected']:
+            raise RuntimeError(f'{result["rejected"]} generated records rejected, see {result["rejected_file"]}')
+        # Back to a single file before it is renamed
+        conn.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        conn.close()
+    os.replace(temp_path, db_path)
+    return db_path
+
+
+def fleet_files(data_dir, rows, seed=SEED, anchor=None):
+    """(csv_path, db_path) of the generated data set, created on first use and then reused."""
+    anchor = anchor or date.today()
+    os.makedirs(data_dir, exist_ok=True)
+    base = os.path.join(data_dir, f'fleet_{rows}_{seed}_{anchor.isoformat()}')
+    csv_path, db_path = base + '.csv', base + '.db'
+    if not os.path.exists(csv_path):
+        write_csv(csv_path, rows, seed, anchor)
+    if not os.path.exists(db_path):
+        build_database(db_path, csv_path)
+    return csv_path, db_path
@@ -0,0 +1,228 @@
+# benchmarks/scenarios.py
+# The timed scenarios. Each one is a function taking the Bench and doing its setup, which
+# is not timed; it returns the function that is timed, run once per repeat. What that
+# returns (rows loaded, written or found) goes in the results, so that runs on different
+# versions can be checked to have done the same work.
+import os
+import random
+from datetime import date, timedelta
+
+from PyQt5.QtCore import QEventLoop
+from PyQt5.QtWidgets import QApplication
+
+import queries
+from dashboard_data import fetch_notifications
+from db_connections import connect
+from db_executor import DatabaseExecutor
+from db_schema import ensure_schema
+from derived_fields import DERIVED_FIELDS, recompute_derived_fields
+from notifications_window import NotificationsWindow
+from records_aging import refresh_aging
+from records_repository import RecordsRepository
+from records_store import import_file
+from reports import stato_report_column, write_notifications_report, write_stato_report
+from stato_targa_tab import StatoTargaTab
+from streaming_export import export_query
+from working_days import aging_counts, add_working_days, calculate_working_days, working_days_since
+
+# Targhe looked up by search_record, and records run through the per-record working-day math
+SEARCHES = 1000
+SCALAR_RECORDS = 10_000
+
+
+class Bench:
+    def __init__(self, csv_path, db_path, work_dir, seed):
+        """The generated data set, a connection and a DatabaseExecutor on it, and a folder for output files."""
+        self.csv_path = csv_path
+        self.db_path = db_path
+        self.work_dir = work_dir
+        self.rng = random.Random(seed)
+        os.makedirs(work_dir, exist_ok=True)
+        self.conn = connect(db_path)
+        # Brings the records_aging ages to today, as the app does when it starts
+        ensure_schema(self.conn)
+        self.executor = DatabaseExecutor(db_path)
+
+    def sample(self, sql, count):
+        """count rows of sql (selecting by id), from ids drawn with the bench seed."""
+        max_id = self.conn.execute(queries.MAX_RECORD_ID).fetchone()[0]
+        ids = self.rng.sample(range(1, max_id + 1), min(count, max_id))
+        return [self.conn.execute(sql, (record_id,)).fetchone() for record_id in ids]
+
+    def close(self):
+        self.executor.shutdown()
+        self.conn.close()
+
+
+class TabLoads:
+    def __init__(self, search):
+        """Count the results the DebouncedSearch of a tab hands to the tab, so a load can be waited for."""
+        self.applied = 0
+        self.result = None
+        self.error = None
+        self.apply = search.apply
+        search.apply = self.on_apply
+        # Instead of the tab's message box
+        search.error_handler = self.on_error
+
+    def on_apply(self, result):
+        self.apply(result)
+        self.result = result
+        self.applied += 1
+
+    def on_error(self, message):
+        self.error = message
+
+    def wait(self, count):
+        """Process Qt events until count results reached the tab; returns the last one."""
+        app = QApplication.instance()
+        while self.applied < count:
+            if self.error is not None:
+                raise RuntimeError(self.error)
+            app.processEvents(QEventLoop.WaitForMoreEvents)
+        return self.result
+
+
+def load_notifications(bench):
+    tab = NotificationsWindow(bench.executor)
+    loads = TabLoads(tab.search)
+
+    def run():
+        tab.load_notifications()
+        return len(loads.wait(loads.applied + 1))
+    return run
+
+
+def stato_load_data(bench):
+    tab = StatoTargaTab(bench.executor)
+    loads = TabLoads(tab.search)
+    # The tab loads once when it is created
+    loads.wait(1)
+
+    def run():
+        tab.load_data()
+        return int(loads.wait(loads.applied + 1)['column_counts'].sum())
+    return run
+
+
+def notifications_report(bench):
+    notifications = fetch_notifications(bench.conn)
+
+    def run():
+        write_notifications_report(notifications, '', folder=bench.work_dir)
+        return len(notifications)
+    return run
+
+
+def stato_report(bench):
+    # The cars the report lists, one per card
+    cards = sum(1 for targa, stato, ditta, _ in bench.conn.execute(queries.STATO_REPORT_ROWS)
+                if targa is not None and stato_report_column(stato, ditta) is not None)
+
+    def run():
+        write_stato_report(bench.conn, 'Flotta_All', folder=bench.work_dir)
+        return cards
+    return run
+
+
+def export_all(extension):
+    def scenario(bench):
+        file_path = os.path.join(bench.work_dir, f'export_all.{extension}')
+        return lambda: export_query(bench.conn, queries.EXPORT_ALL, [], file_path)
+    return scenario
+
+
+def import_data(bench):
+    db_path = os.path.join(bench.work_dir, 'import.db')
+
+    def run():
+        # Into an empty database each time: creating its schema is part of the timing, but takes milliseconds
+        for path in (db_path, db_path + '-wal', db_path + '-shm'):
+            if os.path.exists(path):
+                os.remove(path)
+        conn = connect(db_path)
+        try:
+            ensure_schema(conn)
+            return import_file(conn, bench.csv_path)['imported']
+        finally:
+            conn.close()
+    return run
+
+
+def recompute_all_derived_fields(bench):
+    """The derived fields of every record written from scratch, as after an import of the whole history."""
+    db_path = os.path.join(bench.work_dir, 'recompute.db')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = connect(db_path)
+    bench.conn.backup(conn)
+    conn.execute(f"UPDATE records SET {', '.join(f'{field} = NULL' for field in DERIVED_FIELDS)}")
+    conn.commit()
+
+    def run():
+        try:
+            return recompute_derived_fields(conn)['changed']
+        finally:
+            # Back to the cleared fields for the next run
+            conn.rollback()
+    return run
+
+
+def search_record(bench):
+    repository = RecordsRepository(bench.conn, bench.executor)
+    targhe = [row['targa'] for row in bench.sample(queries.RECORD_BY_ID, SEARCHES)]
+
+    def run():
+        return sum(len(repository.by_targa(targa)) for targa in targhe)
+    return run
+
+
+def working_days_per_record(bench):
+    """The working-day math of adding and updating a record, as main_window does it for one record."""
+    records = bench.sample(queries.RECORD_BY_ID, SCALAR_RECORDS)
+
+    def run():
+        total = 0
+        for record in records:
+            total += calculate_working_days(record['entrata'], record['data_incarico'])
+            add_working_days(record['data_incarico'], 10)
+            if record['inizio_carr'] and record['fine_carr']:
+                total += calculate_working_days(record['inizio_carr'], record['fine_carr'])
+        return total
+    return run
+
+
+def working_days_columns(bench):
+    """Ages of every record at once, on the columns as fetched from the database."""
+    data_incarico = [row[0] for row in bench.conn.execute('SELECT data_incarico FROM records')]
+
+    def run():
+        return aging_counts(working_days_since(data_incarico))
+    return run
+
+
+def refresh_records_aging(bench):
+    """The daily recompute of records_aging, in SQL."""
+    def run():
+        # Marked as computed on another day, so the refresh has to redo every age
+        bench.conn.execute('UPDATE records_aging_day SET day = ?', ((date.today() - timedelta(days=1)).toordinal(),))
+        bench.conn.commit()
+        refresh_aging(bench.conn)
+        return bench.conn.execute('SELECT COUNT(*) FROM records_aging').fetchone()[0]
+    return run
+
+
+SCENARIOS = {
+    'load_notifications': load_notifications,
+    'stato_load_data': stato_load_data,
+    'notifications_report': notifications_report,
+    'stato_report': stato_report,
+    'export_xlsx': export_all('xlsx'),
+    'export_csv': export_all('csv'),
+    'import_data': import_data,
+    'recompute_derived_fields': recompute_all_derived_fields,
+    'search_record': search_record,
+    'working_days_per_record': working_days_per_record,
+    'working_days_columns': working_days_columns,
+    'refresh_aging': refresh_records_aging,
+}
@@ -0,0 +1,219 @@
+# bulk_import.py
+# Streaming import of .csv / .xlsx files into the records table.
+#
+# The file is read in chunks of CHUNK_SIZE rows (pandas chunked CSV reader, openpyxl
+# read-only mode for Excel), so memory stays bounded whatever the file size. Each chunk
+# is converted column by column and inserted with a single executemany in its own
+# transaction, with the per-row insert triggers suspended: the day ordinals are computed in
+# the INSERT itself and the chunk is indexed for search in one statement. When a chunk
+# fails, it is rolled back and inserted row by row so that only the bad rows are rejected;
+# those are written to a CSV report next to the imported file.
+import csv
+import os
+import sqlite3
+from datetime import date, datetime
+from itertools import islice
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from db_schema import DATE_COLUMNS, ordinal_column, date_ordinal_sql, begin_bulk_load, end_bulk_load
+from working_days import DATE_FORMAT
+
+CHUNK_SIZE = 5000
+
+# Columns taken from the imported file, matched to its headers by name
+IMPORT_COLUMNS = [
+    'flotta', 'targa', 'modello', 'entrata', 'data_incarico',
+    'ditta', 'inizio_mecc', 'fine_mecc', 'inizio_carr', 'fine_carr',
+    'pezzi_carr', 'stato', 'note', 'data_consegnata'
+]
+
+ISO_DATE_PATTERN = r'^(\d{4})-(\d{2})-(\d{2})'
+
+# Excel serial dates count days from this one; 1 is 01/01/1900 and 2958465 is 31/12/9999
+EXCEL_EPOCH = '1899-12-30'
+EXCEL_SERIAL_RANGE = (1, 2958465)
+
+
+def find_closest_column(required_col, available_columns):
+    """Position of the first header containing required_col (or contained in it), None if missing."""
+    for position, col in enumerate(available_columns):
+        col = str(col).strip().lower()
+        if col and (required_col in col or col in required_col):
+            return position
+    return None
+
+
+def map_columns(available_columns):
+    """Map every importable column found in the file headers to the header position."""
+    column_mapping = {}
+    for required_col in IMPORT_COLUMNS:
+        position = find_closest_column(required_col, available_columns)
+        if position is not None:
+            column_mapping[required_col] = position
+    return column_mapping
+
+
+def read_chunks(file_path, chunk_size=CHUNK_SIZE):
+    """Yield the data rows of an .xlsx or .csv file as DataFrames of at most chunk_size rows."""
+    if file_path.lower().endswith('.csv'):
+        # Values are kept as text: SQLite column affinity converts the numeric ones
+        yield from pd.read_csv(file_path, dtype=str, chunksize=chunk_size)
+        return
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = ['' if value is None else str(value) for value in header]
+        width = len(columns)
+        while True:
+            block = list(islice(rows, chunk_size))
+            if not block:
+                break
+            # Rows of a read-only sheet are not always as wide as the header
+            block = [tuple(row[:width]) + (None,) * (width - len(row)) for row in block]
+            yield pd.DataFrame.from_records(block, columns=columns)
+    finally:
+        workbook.close()
+
+
+def is_excel_serial(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    return EXCEL_SERIAL_RANGE[0] <= value <= EXCEL_SERIAL_RANGE[1]
+
+
+def convert_column(values, is_date_column):
+    """Column-wise conversion of imported values to what is stored in records."""
+    values = values.astype(object)
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    # Dates read from Excel arrive as datetime objects: store them as dd/mm/yyyy like the app does
+    if kind not in ('string', 'empty', 'integer', 'floating'):
+        is_date = values.map(lambda value: isinstance(value, (datetime, date)))
+        if is_date.any():
+            values = values.where(~is_date, pd.to_datetime(values[is_date]).dt.strftime(DATE_FORMAT))
+    if is_date_column and kind != 'empty':
+        # Dates in General formatted cells arrive as Excel serial numbers
+        is_serial = values.map(is_excel_serial)
+        if is_serial.any():
+            days = pd.to_datetime(values[is_serial].astype(float), unit='D', origin=EXCEL_EPOCH)
+            values = values.where(~is_serial, days.dt.strftime(DATE_FORMAT))
+        # ISO text dates (CSV exports) are normalized the same way
+        is_text = values.map(lambda value: isinstance(value, str))
+        is_iso = is_text & values.where(is_text, '').str.match(ISO_DATE_PATTERN, na=False)
+        if is_iso.any():
+            values = values.where(~is_iso, values[is_iso].str.replace(ISO_DATE_PATTERN, r'\3/\2/\1', regex=True))
+    # Missing values are stored as empty strings
+    return values.where(values.notna(), '').tolist()
+
+
+def convert_chunk(chunk, column_mapping):
+    """Rows ready for executemany, one tuple per row of the chunk in column_mapping order."""
+    columns = [
+        convert_column(chunk.iloc[:, position], col in DATE_COLUMNS)
+        for col, position in column_mapping.items()
+    ]
+    return list(zip(*columns))
+
+
+class RejectedRows:
+    """CSV report of the rows that could not be imported, created on the first rejection."""
+
+    def __init__(self, file_path, columns):
+        base, _ = os.path.splitext(file_path)
+        self.path = f"{base}_scartati_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        self.columns = columns
+        self.count = 0
+        self.file = None
+        self.writer = None
+
+    def add(self, line, error, values):
+        if self.file is None:
+            self.file = open(self.path, 'w', newline='', encoding='utf-8')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(['riga', 'errore'] + self.columns)
+        self.writer.writerow([line, error] + list(values))
+        self.count += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def insert_sql(columns):
+    """INSERT of the given columns that also fills the day ordinals of the date columns among them."""
+    # Numbered parameters, so each date value is bound once and used by its ordinal expression too
+    parameters = {col: f'?{number}' for number, col in enumerate(columns, 1)}
+    names = list(columns)
+    values = [parameters[col] for col in columns]
+    for col in columns:
+        if col in DATE_COLUMNS:
+            names.append(ordinal_column(col))
+            values.append(date_ordinal_sql(parameters[col]))
+    return f"INSERT INTO records ({', '.join(names)}) VALUES ({', '.join(values)})"
+
+
+def insert_chunk(conn, sql, rows, first_line, rejected):
+    """Insert one chunk in a single transaction; on failure retry it row by row. Returns rows inserted."""
+    try:
+        last_id = begin_bulk_load(conn)
+        conn.executemany(sql, rows)
+        inserted = len(rows)
+    except sqlite3.Error:
+        conn.rollback()
+        last_id = begin_bulk_load(conn)
+        inserted = 0
+        for line, row in enumerate(rows, first_line):
+            try:
+                conn.execute(sql, row)
+                inserted += 1
+            except sqlite3.Error as e:
+                rejected.add(line, str(e), row)
+    end_bulk_load(conn, last_id)
+    conn.commit()
+    return inserted
+
+
+def import_records(conn, file_path, chunk_size=CHUNK_SIZE):
+    """Import an .xlsx or .csv file into records.
+
+    Returns a dict with the imported 'columns' (empty when no header matches), the number
+    of rows 'imported' and 'rejected', and the 'rejected_file' report path (None if none).
+    """
+    result = {'columns': [], 'imported': 0, 'rejected': 0, 'rejected_file': None}
+    chunks = read_chunks(file_path, chunk_size)
+    try:
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
+            return result
+
+        column_mapping = map_columns(first_chunk.columns)
+        columns = list(column_mapping)
+        if not columns:
+            return result
+        result['columns'] = columns
+
+        sql = insert_sql(columns)
+
+        rejected = RejectedRows(file_path, columns)
+        line = 2  # first data row, right below the header
+        try:
+            chunk = first_chunk
+            while chunk is not None:
+                rows = convert_chunk(chunk, column_mapping)
+                result['imported'] += insert_chunk(conn, sql, rows, line, rejected)
+                line += len(rows)
+                chunk = next(chunks, None)
+        finally:
+            rejected.close()
+    finally:
+        chunks.close()
+
+    result['rejected'] = rejected.count
+    if rejected.count:
+        result['rejected_file'] = rejected.path
+    return result
@@ -0,0 +1,184 @@
+# business_calendar.py
+# Working-day calendar kept in the database, so that working-day ages are computed inside
+# the queries that filter on them.
+#
+# business_calendar has one row per day, from CALENDAR_FIRST_YEAR to CALENDAR_YEARS_AHEAD
+# years after the current one: the day ordinal, whether it is a working day (Monday to
+# Friday, not one of the public holidays in working_days.HOLIDAYS nor a day listed in
+# calendar_closures) and the number of working days from the start of the calendar up to
+# it. The working days between two dates are then the difference of two lookups on the
+# primary key. The closures (summer closure, the patron saint, ...) are managed with:
+#
+#   python business_calendar.py [--db app_database.db] list [YEAR]
+#   python business_calendar.py [--db app_database.db] close FROM [TO] REASON
+#   python business_calendar.py [--db app_database.db] reopen FROM [TO]
+#
+# working_days.business_days gets the same days off, so that the ages computed in Python
+# agree with the ones in SQL.
+import argparse
+import sqlite3
+import sys
+from datetime import date, datetime
+
+from working_days import (CALENDAR_FIRST_YEAR, CALENDAR_YEARS_AHEAD, DATE_FORMAT, business_days,
+                          public_holidays)
+
+CALENDAR_FIRST_DAY = date(CALENDAR_FIRST_YEAR, 1, 1).toordinal()
+
+
+def working_days_sql(start_ordinal, end_ordinal):
+    """SQL version of working_days.count_working_days: 0 for a missing start or a start after the end.
+
+    Starts before the calendar count from its first day.
+    """
+    return (
+        f'CASE WHEN {start_ordinal} IS NULL OR {start_ordinal} > {end_ordinal} THEN 0 '
+        f'ELSE (SELECT number FROM business_calendar WHERE day = {end_ordinal}) '
+        f'- (SELECT number - working FROM business_calendar WHERE day = MAX({start_ordinal}, {CALENDAR_FIRST_DAY})) END'
+    )
+
+
+def has_calendar_table(conn):
+    row = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'business_calendar'"
+    ).fetchone()
+    return row[0] > 0
+
+
+def closures(conn):
+    """The closures as (date, reason) pairs, in date order."""
+    rows = conn.execute('SELECT day, reason FROM calendar_closures ORDER BY day').fetchall()
+    return [(date.fromordinal(day), reason) for day, reason in rows]
+
+
+def days_off(conn, last_year):
+    """Public holidays and closures up to the end of last_year, as dates."""
+    return set(public_holidays(CALENDAR_FIRST_YEAR, last_year)) | {day for day, _ in closures(conn)}
+
+
+def build_calendar(conn, last_year):
+    """Rewrite business_calendar up to the end of last_year and hand its days off to working_days."""
+    off = days_off(conn, last_year)
+    rows = []
+    number = 0
+    for day in range(CALENDAR_FIRST_DAY, date(last_year, 12, 31).toordinal() + 1):
+        working = date.fromordinal(day).weekday() < 5 and date.fromordinal(day) not in off
+        number += working
+        rows.append((day, working, number))
+    conn.execute('DELETE FROM business_calendar')
+    conn.executemany('INSERT INTO business_calendar (day, working, number) VALUES (?, ?, ?)', rows)
+    business_days.set_days_off(off)
+
+
+def calendar_last_year(today=None):
+    return (today or date.today()).year + CALENDAR_YEARS_AHEAD
+
+
+def extend_calendar(conn, today=None):
+    """Extend business_calendar to CALENDAR_YEARS_AHEAD years after today's; True if it was.
+
+    The working-day numbers of the days already there do not change.
+    """
+    last_year = calendar_last_year(today)
+    last_day = conn.execute('SELECT MAX(day) FROM business_calendar').fetchone()[0]
+    if last_day is not None and last_day >= date(last_year, 12, 31).toordinal():
+        return False
+    build_calendar(conn, last_year)
+    return True
+
+
+def ensure_calendar(conn):
+    """Create or extend business_calendar and calendar_closures, and load the days off into working_days."""
+    conn.execute('BEGIN')
+    try:
+        if not has_calendar_table(conn):
+            conn.execute('''
+                CREATE TABLE calendar_closures (
+                    day INTEGER PRIMARY KEY,
+                    reason TEXT NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE business_calendar (
+                    day INTEGER PRIMARY KEY,
+                    working INTEGER NOT NULL,
+                    number INTEGER NOT NULL
+                )
+            ''')
+        if not extend_calendar(conn):
+            business_days.set_days_off(days_off(conn, calendar_last_year()))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def set_closures(conn, first_day, last_day, reason=None):
+    """Close the workshop from first_day to last_day (both included), or reopen it when reason is None.
+
+    The calendar is rebuilt, and every age and derived field of the records recomputed.
+    """
+    # Imported here: records_aging imports this module for working_days_sql, and derived_fields
+    # imports db_schema, which imports this module for ensure_calendar
+    from derived_fields import recompute_derived_fields
+    from records_aging import refresh_aging
+
+    days = [(day, reason) for day in range(first_day.toordinal(), last_day.toordinal() + 1)]
+    conn.execute('BEGIN')
+    try:
+        if reason is None:
+            conn.executemany('DELETE FROM calendar_closures WHERE day = ?', [(day,) for day, _ in days])
+        else:
+            conn.executemany('INSERT OR REPLACE INTO calendar_closures (day, reason) VALUES (?, ?)', days)
+        build_calendar(conn, calendar_last_year())
+        recompute_derived_fields(conn)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    refresh_aging(conn, force=True)
+
+
+def parse_day(text):
+    return datetime.strptime(text, DATE_FORMAT).date()
+
+
+def main(argv=None):
+    # Imported here: db_schema imports this module
+    from db_connections import DB_PATH, connect
+    from db_schema import ensure_schema
+
+    parser = argparse.ArgumentParser(prog='python business_calendar.py', description='Chiusure dell\'officina')
+    parser.add_argument('--db', default=DB_PATH, help='database file (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('list', help='closures and public holidays of a year')
+    command.add_argument('year', type=int, nargs='?', default=date.today().year)
+    command = commands.add_parser('close', help='add closure days, dates as dd/mm/yyyy')
+    command.add_argument('dates', type=parse_day, nargs='+', metavar='FROM [TO]')
+    command.add_argument('reason')
+    command = commands.add_parser('reopen', help='remove closure days, dates as dd/mm/yyyy')
+    command.add_argument('dates', type=parse_day, nargs='+', metavar='FROM [TO]')
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    conn = connect(args.db)
+    try:
+        ensure_schema(conn)
+        if args.command == 'list':
+            days = [(day, 'Festività') for day in public_holidays(args.year, args.year)]
+            days += [(day, reason) for day, reason in closures(conn) if day.year == args.year]
+            for day, reason in sorted(days):
+                print(f'{day.strftime(DATE_FORMAT)}  {reason}')
+            return 0
+        if len(args.dates) > 2 or args.dates[0] > args.dates[-1]:
+            parser.error('give one day, or the first and the last day of the period')
+        set_closures(conn, args.dates[0], args.dates[-1], args.reason if args.command == 'close' else None)
+        days = (args.dates[-1] - args.dates[0]).days + 1
+        print(f"{days} days {'closed' if args.command == 'close' else 'reopened'}; "
+              'ages and derived fields recomputed, restart the app to use the new calendar')
+        return 0
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,38 @@
+# counts_check.py
+# Compares the trigger-maintained records_counts table with the records table.
+#
+#   python counts_check.py [--rebuild] [app_database.db]
+#
+# Prints every count that drifted and exits with status 1 if any did. With --rebuild the
+# counts are recomputed from the records first, and the check runs on the result.
+import sys
+
+from db_connections import connect
+from db_schema import ensure_schema
+from records_counts import verify_counts, rebuild_counts
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    rebuild = '--rebuild' in argv
+    paths = [arg for arg in argv if arg != '--rebuild']
+    db_path = paths[0] if paths else 'app_database.db'
+    conn = connect(db_path)
+    ensure_schema(conn)
+
+    if rebuild:
+        rebuild_counts(conn)
+        print('records_counts rebuilt')
+
+    differences = verify_counts(conn)
+    for dimension, key1, key2, stored, expected in differences:
+        key = f'{key1} / {key2}' if dimension == 'stato_flotta' else key1
+        print(f'{dimension} {key!r}: stored {stored}, expected {expected}')
+
+    conn.close()
+    print(f'{len(differences)} counts out of sync')
+    return 1 if differences else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# dashboard_data.py
+# Queries behind the Notifiche and Stato Lavorazioni tabs. Nothing here touches Qt, so
+# these functions can run on a worker thread with that thread's own connection.
+import json
+from datetime import date
+
+import numpy as np
+
+import queries
+from db_schema import STATI
+from search_index import has_search_index, can_match, match_expression
+from working_days import AGING_COLORS, bucket_counts
+
+
+def fetch_frame(cursor):
+    """Result of an executed cursor as a DataFrame of object columns, values as sqlite returned them."""
+    # Imported on first use, on the worker thread running the query, not while the app starts
+    import pandas as pd
+
+    columns = [description[0] for description in cursor.description]
+    return pd.DataFrame(cursor.fetchall(), columns=columns, dtype=object)
+
+
+def notifications_frame(cursor):
+    """Rows of an executed NOTIFICATIONS query as a DataFrame, working_days as integers."""
+    notifications = fetch_frame(cursor)
+    notifications['working_days'] = notifications['working_days'].astype(np.int64)
+    return notifications
+
+
+def fetch_notifications(conn, search_text=''):
+    """Open records more than 10 working days past data_incarico, as a DataFrame with a working_days column."""
+    # Ages are read from records_aging (see records_repository for the daily refresh)
+    # Plain tuples: the rows go straight into the columns of the DataFrame
+    cursor = conn.cursor()
+    cursor.row_factory = None
+
+    # Filter by flotta, targa, ditta or note using a single input field
+    if can_match(search_text, has_search_index(conn)):
+        cursor.execute(queries.NOTIFICATIONS_MATCH, (match_expression(search_text),))
+    elif search_text:
+        # Use the same search term for all four fields
+        search_param = f'%{search_text}%'
+        cursor.execute(queries.NOTIFICATIONS_SEARCH, (search_param,) * 4)
+    else:
+        cursor.execute(queries.NOTIFICATIONS)
+    return notifications_frame(cursor)
+
+
+def fetch_flotta_notifications(conn, flotta_names):
+    """fetch_notifications for the records whose flotta is exactly one of flotta_names."""
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(queries.NOTIFICATIONS_FLOTTE, (json.dumps(flotta_names),))
+    return notifications_frame(cursor)
+
+
+def fetch_stato_board(conn, search_filter=''):
+    """The Stato Lavorazioni board (open records and those delivered today), already pivoted.
+
+    Returns a dict of equally long arrays, one entry per card: 'columns' (index into STATI),
+    'rows' (position inside the column), 'labels' and 'colors'; plus 'column_counts'
+    (cards per column) and 'aging_counts' (legend counts of the open records).
+    """
+    today_ord = date.today().toordinal()
+
+    cursor = conn.cursor()
+    cursor.row_factory = None
+
+    # Filter by flotta, targa, ditta or note using a single input field
+    if can_match(search_filter, has_search_index(conn)):
+        cursor.execute(queries.STATO_BOARD_MATCH, (match_expression(search_filter), today_ord))
+    elif search_filter:
+        # Use the same search term for all four fields, in both halves of the query
+        search_params = (f'%{search_filter}%',) * 4
+        cursor.execute(queries.STATO_BOARD_SEARCH, search_params + (today_ord,) + search_params)
+    else:
+        cursor.execute(queries.STATO_BOARD, (today_ord,))
+    board = fetch_frame(cursor)
+
+    columns = board['col'].to_numpy(dtype=np.int64)
+    buckets = board['bucket'].to_numpy(dtype=np.int64)
+
+    # Consegnata is always green
+    delivered = columns == STATI.index('Consegnata')
+    colors = AGING_COLORS[buckets].astype(object)
+    colors[delivered] = 'green'
+
+    return {
+        'columns': columns,
+        'rows': board['row'].to_numpy(dtype=np.int64),
+        'labels': board['label'].to_numpy(),
+        'colors': colors,
+        'column_counts': np.bincount(columns, minlength=len(STATI)),
+        'aging_counts': bucket_counts(buckets[~delivered]),
+    }
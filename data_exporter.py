@@ -1,6 +1,6 @@
 from PyQt5.QtWidgets import QFileDialog, QMessageBox
-import pandas as pd
-from datetime import datetime
+import queries
+from streaming_export import export_query, export_file_name
 
 def execute_extrapolate(main_window):
     # Select the folder to save the file
@@ -9,59 +9,38 @@ def execute_extrapolate(main_window):
         QMessageBox.warning(main_window, 'Errore', 'Nessuna cartella selezionata.')
         return
 
+    flotta = None
     if main_window.radio_all_data.isChecked():
-        query = 'SELECT * FROM records'
-        params = []
-        filename = 'DataBaseB2B.xlsx'
+        name = 'all'
     elif main_window.radio_exclude_consegnata.isChecked():
-        query = 'SELECT * FROM records WHERE stato != ?'
-        params = ['Consegnata']
-        filename = 'DataBaseB2B_lavorazione.xlsx'
+        name = 'open'
     elif main_window.radio_by_flotta.isChecked():
         flotta = main_window.text_flotta_extrapolate.text().upper()
         if not flotta:
             QMessageBox.warning(main_window, 'Errore di input', 'Per favore, inserisci la Flotta.')
             return
         only_consegnata = main_window.checkbox_exclude_consegnata.isChecked()
-        query = 'SELECT * FROM records WHERE flotta = ?'
-        params = [flotta]
-        if only_consegnata:
-            query += ' AND stato = ?'
-            params.append('Consegnata')
-            filename = f'DataBaseB2B_{flotta}_consegnata.xlsx'
-        else:
-            filename = f'DataBaseB2B_{flotta}.xlsx'
+        name = 'flotta_consegnata' if only_consegnata else 'flotta'
     else:
         QMessageBox.warning(main_window, 'Errore di selezione', 'Per favore, seleziona un\'opzione.')
         return
+    query = queries.EXPORTS[name]
+    params = [flotta] if flotta else []
+    filename = export_file_name(name, flotta)
 
-    try:
-        df = pd.read_sql_query(query, main_window.conn, params=params)
-        if df.empty:
-            QMessageBox.information(main_window, 'Nessun dato', 'Nessun dato trovato per i criteri selezionati.')
-            return
-        
-        # Remove the 'id' column if it exists
-        if 'id' in df.columns:
-            df = df.drop(columns=['id'])
-
-        # Reorder columns to place 'data_consegnata' between 'stato' and 'note'
-        columns_order = df.columns.tolist()
-        if 'data_consegnata' in columns_order:
-            # Ensure the desired order of columns if they exist
-            columns_order.remove('data_consegnata')
-            if 'note' in columns_order:
-                note_index = columns_order.index('note')
-                columns_order.insert(note_index, 'data_consegnata')
-            else:
-                columns_order.append('data_consegnata')
-            df = df[columns_order]
+    # Rows are streamed from a reader thread of the executor straight into the file
+    extension = main_window.combo_export_format.currentData()
+    full_filename = f'{folder_path}/{filename}.{extension}'
+    main_window.executor.submit(
+        export_query, query, params, full_filename,
+        callback=lambda exported: export_finished(main_window, exported, full_filename),
+        error_callback=lambda e: QMessageBox.warning(main_window, 'Errore', str(e))
+    )
 
-        # Define the full path for the output file
-        full_filename = f'{folder_path}/{filename}'
 
-        df.to_excel(full_filename, index=False)
-        QMessageBox.information(main_window, 'Successo', f'Dati esportati nel file {full_filename}')
-        main_window.extrapolate_group.hide()
-    except Exception as e:
-        QMessageBox.warning(main_window, 'Errore', str(e))
\ No newline at end of file
+def export_finished(main_window, exported, full_filename):
+    if not exported:
+        QMessageBox.information(main_window, 'Nessun dato', 'Nessun dato trovato per i criteri selezionati.')
+        return
+    QMessageBox.information(main_window, 'Successo', f'{exported} record esportati nel file {full_filename}')
+    main_window.extrapolate_group.hide()
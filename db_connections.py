@@ -0,0 +1,87 @@
+# db_connections.py
+# Every sqlite3 connection of the app is opened here, so they all share the same settings.
+#
+# The database runs in WAL mode: readers work on a snapshot and never block the writer, and
+# the writer never blocks them, so an export or a report can run while a record is being
+# saved. Writes from different connections still take turns; busy_timeout makes a
+# connection wait for its turn instead of failing at once with "database is locked".
+# Report and search connections are opened read-only, so they can never take the write lock.
+# Once sql_trace.stats is enabled, the connections opened here time every statement.
+import os
+import random
+import sqlite3
+import time
+from pathlib import Path
+
+from sql_trace import TracedConnection, stats
+
+DB_PATH = 'app_database.db'
+
+BUSY_TIMEOUT_MS = 10000
+
+# Retries of a write still refused with SQLITE_BUSY after the busy timeout, with the pause
+# doubling each time (BUSY_BACKOFF_S, then twice that, ...) and jittered so that two
+# workstations do not retry in lockstep
+BUSY_RETRIES = 4
+BUSY_BACKOFF_S = 0.05
+
+# Applied to every connection; none of them persist in the database file
+PRAGMAS = {
+    # Safe with WAL: a power cut can lose the last commits but never corrupt the file
+    'synchronous': 'NORMAL',
+    # Pages are read through a memory map instead of read() calls into the page cache
+    'mmap_size': 256 * 1024 * 1024,
+    # Negative values are KiB: 32 MB of page cache per connection
+    'cache_size': -32 * 1024,
+    'busy_timeout': BUSY_TIMEOUT_MS,
+    # Sorts, DISTINCT and materialized CTEs stay in memory
+    'temp_store': 'MEMORY',
+}
+
+
+def configure(conn):
+    for name, value in PRAGMAS.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+
+
+def connect(db_path=DB_PATH, read_only=False, check_same_thread=True):
+    """Open a configured connection to db_path, with sqlite3.Row rows.
+
+    Writable connections switch the database to WAL mode, which is then kept in the file.
+    A read-only connection needs the database to exist already.
+    """
+    factory = TracedConnection if stats.enabled else sqlite3.Connection
+    if read_only:
+        uri = f'{Path(os.path.abspath(db_path)).as_uri()}?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=check_same_thread, factory=factory)
+    else:
+        conn = sqlite3.connect(db_path, check_same_thread=check_same_thread, factory=factory)
+        conn.execute('PRAGMA journal_mode = WAL')
+    configure(conn)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def is_busy(error):
+    # sqlite_errorname is there from Python 3.11 on; older versions only have the message
+    name = getattr(error, 'sqlite_errorname', '')
+    return name.startswith(('SQLITE_BUSY', 'SQLITE_LOCKED')) or 'database is locked' in str(error)
+
+
+def run_with_retry(conn, fn, *args, retries=BUSY_RETRIES, backoff=BUSY_BACKOFF_S):
+    """Run fn(conn, *args) as one transaction and commit it; returns what fn returns.
+
+    On SQLITE_BUSY the transaction is rolled back and run again after a pause. In WAL mode
+    this covers the case busy_timeout cannot: a read transaction that wants to write after
+    another connection committed gets SQLITE_BUSY at once, and only a fresh one can succeed.
+    """
+    for attempt in range(retries + 1):
+        try:
+            result = fn(conn, *args)
+            conn.commit()
+            return result
+        except sqlite3.Error as e:
+            conn.rollback()
+            if attempt == retries or not is_busy(e):
+                raise
+        time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
@@ -0,0 +1,109 @@
+# db_executor.py
+# Runs database work off the Qt GUI thread.
+#
+# sqlite3 connections must not be shared between threads, so every worker thread opens its
+# own connection to the database file and each task receives the connection of the thread
+# it runs on. Reads go to a small pool of reader threads with read-only connections; the
+# long writes (imports, the aging refresh) go to a single writer thread, so they are
+# serialized among themselves. The single-record writes of records_repository run on the GUI
+# thread's own connection instead: the two connections do contend for the database lock,
+# which busy_timeout and db_connections.run_with_retry ride out. Results come back to
+# the GUI thread through a queued Qt signal.
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+
+from db_connections import connect
+
+
+class DatabaseExecutor(QObject):
+    task_done = pyqtSignal(object, object, object)
+
+    def __init__(self, db_path, readers=2, parent=None):
+        super().__init__(parent)
+        self.db_path = db_path
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = []
+        self.running = {}  # task token -> connection executing it, so it can be interrupted
+
+        self.read_pool = ThreadPoolExecutor(max_workers=readers, thread_name_prefix='db-reader')
+        self.write_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+
+        # Emitted from worker threads, delivered on the thread this object lives in (the GUI thread).
+        # Always queued, so callbacks never run inside submit() even for a task that finished at once.
+        self.task_done.connect(self.deliver, Qt.QueuedConnection)
+
+    def thread_connection(self, write):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            # check_same_thread=False only so that interrupt() and the final close() may be
+            # called from the GUI thread; the connection is otherwise used by its own thread only.
+            # A thread only ever runs reads or only writes, so its connection never changes mode.
+            conn = connect(self.db_path, read_only=not write, check_same_thread=False)
+            self.local.conn = conn
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+
+    def submit(self, fn, *args, callback=None, error_callback=None, write=False):
+        """Run fn(conn, *args) on a worker thread and return its concurrent.futures.Future.
+
+        callback(result) or error_callback(exception) is then called on the GUI thread.
+        Tasks that write must pass write=True so they run on the single writer thread.
+        """
+        pool = self.write_pool if write else self.read_pool
+        token = object()
+        future = pool.submit(self.run_task, token, fn, args, write)
+        future.token = token
+        future.add_done_callback(lambda done: self.task_done.emit(done, callback, error_callback))
+        return future
+
+    def run_task(self, token, fn, args, write):
+        conn = self.thread_connection(write)
+        with self.lock:
+            self.running[token] = conn
+        try:
+            result = fn(conn, *args)
+            if write:
+                conn.commit()
+            return result
+        except BaseException:
+            if write:
+                conn.rollback()
+            raise
+        finally:
+            with self.lock:
+                self.running.pop(token, None)
+
+    def cancel(self, future):
+        """Cancel a queued task; a task already running on a reader thread is interrupted."""
+        if future.cancel():
+            return
+        # Interrupted under the lock: run_task drops the token under it too, so the connection
+        # cannot have moved on to another task meanwhile
+        with self.lock:
+            conn = self.running.get(future.token)
+            if conn is not None:
+                conn.interrupt()
+
+    def deliver(self, future, callback, error_callback):
+        try:
+            result = future.result()
+        except CancelledError:
+            return
+        except Exception as e:
+            if error_callback:
+                error_callback(e)
+            return
+        if callback:
+            callback(result)
+
+    def shutdown(self):
+        self.read_pool.shutdown(wait=True, cancel_futures=True)
+        self.write_pool.shutdown(wait=True, cancel_futures=True)
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections.clear()
@@ -0,0 +1,321 @@
+# db_schema.py
+import sqlite3
+
+from business_calendar import ensure_calendar
+from search_index import ensure_search_index, has_search_index, create_search_insert_trigger, index_new_records
+from records_aging import ensure_aging_table, has_aging_table, age_new_records
+from records_counts import ensure_counts_table, has_counts_table, count_new_records
+
+# Columns of the records table as shown in the app and exported, in table order.
+# The *_ord shadow columns added by the migrations are internal and never selected with these;
+# version and updated_at are only read along with a record that is about to be changed.
+RECORD_COLUMNS = {
+    'id': 'INTEGER PRIMARY KEY AUTOINCREMENT',
+    'flotta': 'TEXT',
+    'targa': 'TEXT',
+    'modello': 'TEXT',
+    'entrata': 'TEXT',
+    'data_incarico': 'TEXT',
+    'ditta': 'TEXT',
+    'inizio_mecc': 'TEXT',
+    'fine_mecc': 'TEXT',
+    'inizio_carr': 'TEXT',
+    'fine_carr': 'TEXT',
+    'pezzi_carr': 'INTEGER',
+    'stato': 'TEXT',
+    'note': 'TEXT',
+    'gg_entrata_data_incarico': 'INTEGER',
+    'prev_uscita': 'TEXT',
+    'gg_inizio_meccanica': 'INTEGER',
+    'gg_inizio_carr': 'INTEGER',
+    'gg_lavorazione_mecc': 'INTEGER',
+    'gg_lavorazione_carr': 'INTEGER',
+    'downtime': 'INTEGER',
+    'data_consegnata': 'TEXT'
+}
+
+RECORD_FIELDS = ', '.join(RECORD_COLUMNS)
+
+# Values of records.stato, in the order of the Stato Lavorazioni board columns
+STATI = [
+    'Attesa Perizia', 'Attesa Autorizzazione', 'Attesa Ricambi',
+    'Lavorazione Carr.', 'Lavorazione Mecc.', 'Casa Madre',
+    'Altri Lavori', 'Pronta', 'Consegnata'
+]
+
+# Date columns stored as 'dd/mm/yyyy' text. Each one gets an integer <column>_ord
+# shadow column holding the day ordinal (same numbering as date.toordinal()),
+# which sorts and compares correctly and can be indexed.
+DATE_COLUMNS = [
+    'entrata', 'data_incarico', 'inizio_mecc', 'fine_mecc',
+    'inizio_carr', 'fine_carr', 'prev_uscita', 'data_consegnata'
+]
+
+# julianday() of 0001-01-01 is 1721425.5 while its date.toordinal() is 1
+JULIAN_DAY_OFFSET = 1721424.5
+
+
+def ordinal_column(column):
+    return f'{column}_ord'
+
+
+def date_ordinal_sql(column):
+    """SQL expression turning a 'dd/mm/yyyy' (or legacy ISO 'yyyy-mm-dd') text column into a day ordinal.
+
+    Invalid or empty dates give NULL.
+    """
+    italian = f"substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' || substr({column}, 1, 2)"
+    iso = f"substr({column}, 1, 10)"
+    return (
+        f"CASE "
+        f"WHEN {column} GLOB '[0-3][0-9]/[01][0-9]/[0-9][0-9][0-9][0-9]' AND date({italian}, '+0 days') = {italian} "
+        f"THEN CAST(julianday({italian}) - {JULIAN_DAY_OFFSET} AS INTEGER) "
+        f"WHEN {column} GLOB '[0-9][0-9][0-9][0-9]-[01][0-9]-[0-3][0-9]*' AND date({iso}, '+0 days') = {iso} "
+        f"THEN CAST(julianday({iso}) - {JULIAN_DAY_OFFSET} AS INTEGER) "
+        f"END"
+    )
+
+
+def create_records_table(conn):
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA table_info(records)')
+    columns = [info[1] for info in cursor.fetchall()]
+
+    if not columns:
+        columns_def = ', '.join([f'{col} {col_type}' for col, col_type in RECORD_COLUMNS.items()])
+        columns_def += ', UNIQUE(targa, entrata, data_incarico)'
+        cursor.execute(f'''
+            CREATE TABLE records ({columns_def})
+        ''')
+        conn.commit()
+    else:
+        for col, col_type in RECORD_COLUMNS.items():
+            if col not in columns:
+                cursor.execute(f'ALTER TABLE records ADD COLUMN {col} {col_type}')
+        conn.commit()
+
+
+def migrate_date_ordinals(conn):
+    """Add indexed day-ordinal shadow columns for every date column, kept in sync by triggers."""
+    cursor = conn.cursor()
+    cursor.execute('PRAGMA table_info(records)')
+    columns = [info[1] for info in cursor.fetchall()]
+
+    for column in DATE_COLUMNS:
+        # Rows imported before dates were normalized were stored as ISO text: show them as dd/mm/yyyy too
+        cursor.execute(f'''
+            UPDATE OR IGNORE records
+            SET {column} = substr({column}, 9, 2) || '/' || substr({column}, 6, 2) || '/' || substr({column}, 1, 4)
+            WHERE {column} GLOB '[0-9][0-9][0-9][0-9]-[01][0-9]-[0-3][0-9]*'
+        ''')
+        if ordinal_column(column) not in columns:
+            cursor.execute(f'ALTER TABLE records ADD COLUMN {ordinal_column(column)} INTEGER')
+
+    assignments = ', '.join(
+        f'{ordinal_column(column)} = {date_ordinal_sql("NEW." + column)}' for column in DATE_COLUMNS
+    )
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS records_date_ord_insert AFTER INSERT ON records
+        BEGIN
+            UPDATE records SET {assignments} WHERE id = NEW.id;
+        END
+    ''')
+    # Only the *_ord columns are written by the trigger body, so it never re-fires itself
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS records_date_ord_update AFTER UPDATE OF {', '.join(DATE_COLUMNS)} ON records
+        BEGIN
+            UPDATE records SET {assignments} WHERE id = NEW.id;
+        END
+    ''')
+
+    backfill = ', '.join(f'{ordinal_column(column)} = {date_ordinal_sql(column)}' for column in DATE_COLUMNS)
+    cursor.execute(f'UPDATE records SET {backfill}')
+
+
+# While a bulk import holds a row in this table (only ever inside its own transaction, so
+# no other connection sees it), the per-row insert triggers are skipped: the import writes
+# the day ordinals itself and indexes the new rows for search in one statement per chunk.
+# derived_fields holds it too while it rewrites prev_uscita, whose ordinal it writes itself,
+# so that the date ordinal update trigger is skipped as well.
+BULK_LOAD_TABLE = 'records_bulk_load'
+BULK_LOAD_INACTIVE = f'NOT EXISTS (SELECT 1 FROM {BULK_LOAD_TABLE})'
+
+
+def migrate_bulk_load(conn):
+    """Let bulk imports skip the per-row insert triggers."""
+    conn.execute(f'CREATE TABLE IF NOT EXISTS {BULK_LOAD_TABLE} (active INTEGER)')
+
+    assignments = ', '.join(
+        f'{ordinal_column(column)} = {date_ordinal_sql("NEW." + column)}' for column in DATE_COLUMNS
+    )
+    conn.execute('DROP TRIGGER IF EXISTS records_date_ord_insert')
+    conn.execute(f'''
+        CREATE TRIGGER records_date_ord_insert AFTER INSERT ON records
+        WHEN {BULK_LOAD_INACTIVE}
+        BEGIN
+            UPDATE records SET {assignments} WHERE id = NEW.id;
+        END
+    ''')
+    if has_search_index(conn):
+        conn.execute('DROP TRIGGER IF EXISTS records_fts_insert')
+        create_search_insert_trigger(conn)
+
+
+def begin_bulk_load(conn):
+    """Start a bulk load transaction; returns the highest id before the load."""
+    conn.execute(f'INSERT INTO {BULK_LOAD_TABLE} (active) VALUES (1)')
+    return conn.execute('SELECT COALESCE(MAX(id), 0) FROM records').fetchone()[0]
+
+
+def end_bulk_load(conn, last_id):
+    """Do the work of the skipped insert triggers for the rows loaded after last_id; the caller commits."""
+    if has_search_index(conn):
+        index_new_records(conn, last_id)
+    if has_aging_table(conn):
+        age_new_records(conn, last_id)
+    if has_counts_table(conn):
+        count_new_records(conn, last_id)
+    conn.execute(f'DELETE FROM {BULK_LOAD_TABLE}')
+
+
+def migrate_row_versions(conn):
+    """Add a version number and a last-change time to every record, bumped by any update.
+
+    Updates and deletes compare the version they read with the stored one, so a change made
+    from another workstation in between is detected instead of silently overwritten.
+    """
+    conn.execute('ALTER TABLE records ADD COLUMN version INTEGER NOT NULL DEFAULT 1')
+    conn.execute('ALTER TABLE records ADD COLUMN updated_at TEXT')
+    create_version_trigger(conn)
+
+
+def create_version_trigger(conn):
+    """(Re)create the trigger bumping version and updated_at when a record is edited."""
+    # Imported here: derived_fields imports this module
+    from derived_fields import DERIVED_FIELDS
+
+    # A trigger rather than the UPDATE statements themselves, so that every writer bumps it.
+    # version and updated_at are not in the column list, so the trigger never re-fires itself.
+    # Neither are the derived fields: derived_fields rewrites them when the calendar changes or
+    # after any write, and a record nobody edited must not look changed to the other desks.
+    columns = ', '.join(column for column in RECORD_COLUMNS if column != 'id' and column not in DERIVED_FIELDS)
+    conn.execute('DROP TRIGGER IF EXISTS records_version')
+    conn.execute(f'''
+        CREATE TRIGGER records_version AFTER UPDATE OF {columns} ON records
+        BEGIN
+            UPDATE records SET version = OLD.version + 1, updated_at = datetime('now', 'localtime')
+            WHERE id = NEW.id;
+        END
+    ''')
+
+
+def migrate_derived_fields(conn):
+    """Let derived_fields skip the date ordinal update trigger, then recompute every record's derived fields.
+
+    Imported records get them for the first time, the others are counted again on the
+    business calendar, public holidays and closures included.
+    """
+    # Imported here: derived_fields imports this module
+    from derived_fields import recompute_derived_fields
+
+    assignments = ', '.join(
+        f'{ordinal_column(column)} = {date_ordinal_sql("NEW." + column)}' for column in DATE_COLUMNS
+    )
+    conn.execute('DROP TRIGGER IF EXISTS records_date_ord_update')
+    conn.execute(f'''
+        CREATE TRIGGER records_date_ord_update AFTER UPDATE OF {', '.join(DATE_COLUMNS)} ON records
+        WHEN {BULK_LOAD_INACTIVE}
+        BEGIN
+            UPDATE records SET {assignments} WHERE id = NEW.id;
+        END
+    ''')
+    recompute_derived_fields(conn)
+
+
+# (schema version, migration) pairs, applied in order and recorded in PRAGMA user_version
+MIGRATIONS = [
+    (1, migrate_date_ordinals),
+    (2, migrate_bulk_load),
+    (3, migrate_row_versions),
+    (4, migrate_derived_fields),
+    # Databases versioned before the derived fields were left out of records_version
+    (5, create_version_trigger),
+]
+
+
+def migrate(conn):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for target_version, migration in MIGRATIONS:
+        if version >= target_version:
+            continue
+        conn.execute('BEGIN')
+        try:
+            migration(conn)
+            conn.execute(f'PRAGMA user_version = {target_version}')
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        version = target_version
+
+
+# Secondary indexes on records, created and dropped by sync_indexes. Lookups by targa
+# are already served by the implicit UNIQUE(targa, entrata, data_incarico) index.
+INDEXES = {
+    # Notifiche and "incarico older than N days", restricted to vehicles still in the workshop
+    'idx_records_open_incarico': '''
+        CREATE INDEX idx_records_open_incarico ON records(data_incarico_ord)
+        WHERE stato != 'Consegnata'
+    ''',
+    # "Consegnata today" on the Stato Lavorazioni board; also covers counts by stato
+    'idx_records_stato_consegnata': '''
+        CREATE INDEX idx_records_stato_consegnata ON records(stato, data_consegnata_ord)
+    ''',
+    # Estrapola Dati by flotta, optionally restricted to one stato
+    'idx_records_flotta_stato': '''
+        CREATE INDEX idx_records_flotta_stato ON records(flotta, stato)
+    ''',
+    # Date range queries over the whole history
+    'idx_records_entrata_ord': '''
+        CREATE INDEX idx_records_entrata_ord ON records(entrata_ord)
+    ''',
+    'idx_records_data_incarico_ord': '''
+        CREATE INDEX idx_records_data_incarico_ord ON records(data_incarico_ord)
+    ''',
+}
+
+# Indexes with this prefix belong to INDEXES: any not declared there any more gets dropped
+MANAGED_INDEX_PREFIX = 'idx_records_'
+
+
+def sync_indexes(conn):
+    """Create the indexes declared in INDEXES and drop managed indexes no longer declared."""
+    existing = {
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'records'"
+        )
+    }
+    created = False
+    for name, sql in INDEXES.items():
+        if name not in existing:
+            conn.execute(sql)
+            created = True
+    for name in existing:
+        if name.startswith(MANAGED_INDEX_PREFIX) and name not in INDEXES:
+            conn.execute(f'DROP INDEX {name}')
+    if created:
+        # Fresh statistics so the planner knows how selective the new indexes are
+        conn.execute('ANALYZE records')
+    conn.commit()
+
+
+def ensure_schema(conn):
+    """Create the records table if needed and bring it up to the latest schema version."""
+    create_records_table(conn)
+    # Before migrate: migrate_derived_fields counts working days on the calendar's days off
+    ensure_calendar(conn)
+    migrate(conn)
+    sync_indexes(conn)
+    ensure_search_index(conn)
+    ensure_aging_table(conn)
+    ensure_counts_table(conn)
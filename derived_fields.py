@@ -0,0 +1,175 @@
+# derived_fields.py
+# Working-day fields of the records derived from their dates, recomputed in bulk:
+#
+#   gg_entrata_data_incarico  working days from entrata to data_incarico
+#   prev_uscita               expected exit, PREV_USCITA_WORKING_DAYS working days after data_incarico
+#   gg_inizio_meccanica       working days from data_incarico to inizio_mecc
+#   gg_inizio_carr            working days from data_incarico to inizio_carr
+#   gg_lavorazione_mecc       working days from inizio_mecc to fine_mecc
+#   gg_lavorazione_carr       working days from inizio_carr to fine_carr
+#   downtime                  working days from data_incarico to the latest work date
+#
+# with the same rules the Dati tab applies when a record is added or updated. The records
+# are read BATCH_SIZE at a time with the day ordinals of their dates (the *_ord columns),
+# every field of the batch is computed with numpy on working_days.business_days and only
+# the records whose stored values differ are written back, with one executemany per batch.
+# The writes hold the bulk-load row (see db_schema.BULK_LOAD_TABLE), so that the date
+# ordinal trigger does not recompute every ordinal for a new prev_uscita: prev_uscita_ord
+# is written along with it.
+# Every write of records_store (added and updated records, imports), closures of the calendar
+# (business_calendar.set_closures) and schema migration 4 run it; b2b_cli's recompute
+# command runs it by hand. The rewrites do not bump the version of the records (see
+# db_schema.create_version_trigger). Nothing here touches Qt or commits.
+import json
+from datetime import date, datetime
+from functools import lru_cache
+
+import numpy as np
+
+from db_schema import BULK_LOAD_TABLE
+from working_days import DATE_FORMAT, NAT, business_days, count_working_days
+
+PREV_USCITA_WORKING_DAYS = 10
+
+BATCH_SIZE = 20_000
+
+DERIVED_FIELDS = [
+    'gg_entrata_data_incarico', 'prev_uscita', 'gg_inizio_meccanica', 'gg_inizio_carr',
+    'gg_lavorazione_mecc', 'gg_lavorazione_carr', 'downtime',
+]
+
+WORK_DATES = ['inizio_mecc', 'fine_mecc', 'inizio_carr', 'fine_carr']
+
+# id, the ordinals, whether each work date was filled in at all (an invalid one has a NULL
+# ordinal too) and the values stored now
+SOURCE_FIELDS = ', '.join(
+    ['id', 'entrata_ord', 'data_incarico_ord']
+    + [f'{column}_ord' for column in WORK_DATES]
+    + [f"COALESCE({column}, '') != ''" for column in WORK_DATES]
+    + DERIVED_FIELDS
+)
+
+DERIVED_BATCH = f'SELECT {SOURCE_FIELDS} FROM records WHERE id > ? ORDER BY id LIMIT ?'
+
+# ids as a JSON array, so that a whole batch is one parameter
+DERIVED_BATCH_IDS = f'SELECT {SOURCE_FIELDS} FROM records WHERE id IN (SELECT value FROM json_each(?))'
+
+RECORD_IDS_FLOTTA = 'SELECT id FROM records WHERE flotta = ?'
+
+UPDATE_DERIVED_FIELDS = f'''
+    UPDATE records SET {', '.join(f'{field} = ?' for field in DERIVED_FIELDS)}, prev_uscita_ord = ?
+    WHERE id = ?
+'''
+
+# date.toordinal() of datetime64's day 0
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def ordinal_dates(ordinals):
+    """A column of day ordinals (None where missing) as a datetime64[D] array, NaT where missing."""
+    values = np.array(ordinals, dtype=float)
+    missing = np.isnan(values)
+    days = np.where(missing, 0, values - EPOCH_ORDINAL).astype(np.int64).astype('datetime64[D]')
+    days[missing] = NAT
+    return days
+
+
+def optional(counts, present):
+    """counts as Python ints, None where present is False."""
+    return [count if flag else None for count, flag in zip(counts.tolist(), present)]
+
+
+def date_strings(days):
+    """A datetime64[D] array as 'dd/mm/yyyy' strings, None for NaT."""
+    strings = {}
+    result = []
+    for day in days.astype(object):
+        if day is not None and day not in strings:
+            strings[day] = day.strftime(DATE_FORMAT)
+        result.append(None if day is None else strings[day])
+    return result
+
+
+@lru_cache(maxsize=65536)
+def ordinal(date_string):
+    return None if date_string is None else datetime.strptime(date_string, DATE_FORMAT).toordinal()
+
+
+def derive(rows):
+    """The DERIVED_FIELDS values of a batch of DERIVED_BATCH rows, one tuple per row."""
+    columns = list(zip(*rows))
+    entrata, incarico = ordinal_dates(columns[1]), ordinal_dates(columns[2])
+    work = [ordinal_dates(column) for column in columns[3:7]]
+    filled = np.array(columns[7:11], dtype=bool)
+    inizio_mecc, fine_mecc, inizio_carr, fine_carr = work
+    has_inizio_mecc, has_fine_mecc, has_inizio_carr, has_fine_carr = filled
+
+    due = np.full(len(rows), NAT)
+    valid = ~np.isnat(incarico)
+    due[valid] = np.busday_offset(incarico[valid], PREV_USCITA_WORKING_DAYS, roll='backward',
+                                  busdaycal=business_days.calendar)
+
+    # Downtime runs to the latest work date, and is unknown if any of them is invalid.
+    # NaT is the smallest int64, so the latest date is the max of the int64 values.
+    latest = np.stack(work).view(np.int64).max(axis=0).view('datetime64[D]')
+    has_downtime = filled.any(axis=0) & ~(filled & np.isnat(np.stack(work))).any(axis=0)
+
+    return list(zip(
+        count_working_days(entrata, incarico).tolist(),
+        date_strings(due),
+        optional(count_working_days(incarico, inizio_mecc), has_inizio_mecc),
+        optional(count_working_days(incarico, inizio_carr), has_inizio_carr),
+        optional(count_working_days(inizio_mecc, fine_mecc), has_inizio_mecc & has_fine_mecc),
+        optional(count_working_days(inizio_carr, fine_carr), has_inizio_carr & has_fine_carr),
+        optional(count_working_days(incarico, latest), has_downtime),
+    ))
+
+
+def update_batch(conn, rows):
+    """Write the derived fields of the rows that changed; how many did."""
+    changes = [
+        values + (ordinal(values[1]), row[0])
+        for row, values in zip(rows, derive(rows))
+        if values != tuple(row[11:])
+    ]
+    if changes:
+        conn.executemany(UPDATE_DERIVED_FIELDS, changes)
+    return len(changes)
+
+
+def recompute_derived_fields(conn, ids=None, flotta=None, after_id=0, batch_size=BATCH_SIZE):
+    """Recompute the derived fields of the records with an id above after_id, of flotta's or of ids.
+
+    Returns {'records': records read, 'changed': records written}.
+    """
+    if flotta is not None:
+        ids = [row[0] for row in conn.execute(RECORD_IDS_FLOTTA, (flotta,))]
+    if ids is not None:
+        ids = sorted(ids)
+        batches = (
+            conn.execute(DERIVED_BATCH_IDS, (json.dumps(ids[start:start + batch_size]),)).fetchall()
+            for start in range(0, len(ids), batch_size)
+        )
+    else:
+        batches = id_batches(conn, after_id, batch_size)
+
+    result = {'records': 0, 'changed': 0}
+    conn.execute(f'INSERT INTO {BULK_LOAD_TABLE} (active) VALUES (1)')
+    try:
+        for rows in batches:
+            if rows:
+                result['records'] += len(rows)
+                result['changed'] += update_batch(conn, rows)
+    finally:
+        conn.execute(f'DELETE FROM {BULK_LOAD_TABLE}')
+    return result
+
+
+def id_batches(conn, after_id, batch_size):
+    """The DERIVED_BATCH rows of the records with an id above after_id, batch_size at a time."""
+    while True:
+        rows = conn.execute(DERIVED_BATCH, (after_id, batch_size)).fetchall()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
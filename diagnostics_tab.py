@@ -0,0 +1,108 @@
+# diagnostics_tab.py
+# Diagnostica tab: the SQL statements timed by sql_trace, the most time consuming first,
+# with their latency percentiles and histogram over the last sql_trace.WINDOW runs. The
+# "GUI" column counts the runs on the GUI thread, the ones that freeze the window.
+from datetime import datetime
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget,
+                             QTableWidgetItem, QHeaderView, QMessageBox)
+
+from sql_trace import HISTOGRAM_MS, stats
+
+REFRESH_MS = 2000
+
+COLUMNS = [
+    ('sql', 'Query'), ('caller', 'Chiamante'), ('count', 'Esecuzioni'), ('gui_count', 'GUI'),
+    ('errors', 'Errori'), ('total_ms', 'Totale ms'), ('mean_ms', 'Media ms'), ('p50_ms', 'p50 ms'),
+    ('p95_ms', 'p95 ms'), ('max_ms', 'Max ms'), ('rows', 'Righe'),
+]
+HISTOGRAM_HEADERS = [f'<={ms} ms' for ms in HISTOGRAM_MS] + [f'>{HISTOGRAM_MS[-1]} ms']
+# Most time consuming first, until the user sorts by another column
+SORT_COLUMN = [key for key, _ in COLUMNS].index('total_ms')
+
+
+class NumberItem(QTableWidgetItem):
+    # Sorted by value, not as text
+    def __lt__(self, other):
+        return self.data(Qt.UserRole) < other.data(Qt.UserRole)
+
+
+class DiagnosticsTab(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+        self.init_ui()
+
+    def init_ui(self):
+        layout = QVBoxLayout()
+
+        button_layout = QHBoxLayout()
+        if stats.enabled:
+            status = f"Query oltre {stats.slow_ms} ms registrate in {stats.log_path}"
+        else:
+            status = "Tracciamento SQL non attivo"
+        button_layout.addWidget(QLabel(status))
+        button_layout.addStretch()
+
+        self.refresh_button = QPushButton("Aggiorna", self)
+        self.refresh_button.clicked.connect(self.refresh)
+        button_layout.addWidget(self.refresh_button)
+
+        self.reset_button = QPushButton("Azzera", self)
+        self.reset_button.clicked.connect(self.reset)
+        button_layout.addWidget(self.reset_button)
+
+        self.dump_button = QPushButton("Salva statistiche", self)
+        self.dump_button.clicked.connect(self.save_dump)
+        button_layout.addWidget(self.dump_button)
+
+        layout.addLayout(button_layout)
+
+        self.table = QTableWidget(0, len(COLUMNS) + len(HISTOGRAM_HEADERS), self)
+        self.table.setHorizontalHeaderLabels([title for _, title in COLUMNS] + HISTOGRAM_HEADERS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setWordWrap(False)
+        self.table.horizontalHeader().setSortIndicator(SORT_COLUMN, Qt.DescendingOrder)
+        layout.addWidget(self.table)
+
+        self.setLayout(layout)
+
+    def showEvent(self, event):
+        # Only kept up to date while on screen
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        statements = stats.snapshot()
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(statements))
+        for row, statement in enumerate(statements):
+            values = [statement[key] for key, _ in COLUMNS] + statement['histogram']
+            for col, value in enumerate(values):
+                if isinstance(value, str):
+                    item = QTableWidgetItem(value)
+                    item.setToolTip(value)
+                else:
+                    item = NumberItem(f'{value:.1f}' if isinstance(value, float) else str(value))
+                    item.setData(Qt.UserRole, value)
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.table.setItem(row, col, item)
+        self.table.setSortingEnabled(True)
+
+    def reset(self):
+        stats.reset()
+        self.refresh()
+
+    def save_dump(self):
+        file_path = stats.dump(f"sql_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+        QMessageBox.information(self, 'Diagnostica', f'Statistiche salvate in {file_path}')
@@ -1,17 +1,21 @@
 # login_dialog.py
 from PyQt5.QtWidgets import QDialog, QLabel, QLineEdit, QPushButton, QVBoxLayout, QMessageBox
-import bcrypt
-import sqlite3
+
+from db_connections import connect
+from users import ensure_users_table, check_login
 
 class LoginDialog(QDialog):
-    def __init__(self):
+    def __init__(self, client=None):
         super().__init__()
         self.setWindowTitle('DatabaseB2B - Login')
         self.resize(300, 150)
         self.init_ui()
-        self.conn = sqlite3.connect('app_database.db')
-        self.cursor = self.conn.cursor()
-        self.create_users_table()
+        # With a service_client.ServiceClient the credentials are checked by records_service.py
+        self.client = client
+        self.conn = None
+        if client is None:
+            self.conn = connect()
+            ensure_users_table(self.conn)
 
     def init_ui(self):
         self.label_username = QLabel('Username')
@@ -31,30 +35,26 @@ class LoginDialog(QDialog):
 
         self.setLayout(layout)
 
-    def create_users_table(self):
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                username TEXT PRIMARY KEY,
-                password BLOB
-            )
-        ''')
-        self.conn.commit()
-
-        self.cursor.execute("SELECT * FROM users WHERE username = ?", ('b2b',))
-        if not self.cursor.fetchone():
-            hashed_password = bcrypt.hashpw('0000v'.encode('utf-8'), bcrypt.gensalt())
-            self.cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", ('b2b', hashed_password))
-            self.conn.commit()
-
     def handle_login(self):
         username = self.text_username.text()
-        password = self.text_password.text().encode('utf-8')
-
-        self.cursor.execute("SELECT password FROM users WHERE username=?", (username,))
-        result = self.cursor.fetchone()
+        password = self.text_password.text()
+
+        if self.client is not None:
+            try:
+                accepted = self.client.login(username, password)
+            except Exception as e:
+                QMessageBox.warning(self, 'Errore', str(e))
+                return
+        else:
+            accepted = check_login(self.conn, username, password)
 
-        if result and bcrypt.checkpw(password, result[0]):
+        if accepted:
             self.accept()
         else:
             QMessageBox.warning(self, 'Errore', 'Nome utente o password errati')
 
+    def done(self, result):
+        # The main window opens its own connections: release this one however the dialog ends
+        if self.conn is not None:
+            self.conn.close()
+        super().done(result)
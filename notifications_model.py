@@ -0,0 +1,87 @@
+# notifications_model.py
+# Table model of the Notifiche tab, backed by the columns of the notifications DataFrame.
+#
+# Nothing is created per cell: data() reads the value straight from the column arrays and
+# the row background from one array of aging colors computed for the whole result set.
+# Sorting goes through a QSortFilterProxyModel on SORT_ROLE, which gives numbers and
+# dates keys that sort by value instead of by their text.
+import numpy as np
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QBrush, QColor
+
+from db_schema import DATE_COLUMNS
+from working_days import AGING_COLORS, aging_buckets, to_datetime64
+
+SORT_ROLE = Qt.UserRole
+
+
+def is_missing(value):
+    # None, or NaN (the only value not equal to itself)
+    return value is None or value != value
+
+
+def sort_keys(column, values):
+    """Values that sort each column the way a user expects."""
+    # Already loaded by then: the notifications come as a DataFrame
+    import pandas as pd
+
+    if column in DATE_COLUMNS:
+        # Day numbers; missing or invalid dates sort first
+        days = to_datetime64(values)
+        return np.where(np.isnat(days), np.iinfo(np.int64).min, days.astype(np.int64))
+    if values.dtype != object:
+        return values
+    if pd.api.types.infer_dtype(values, skipna=True) in ('integer', 'floating', 'mixed-integer-float'):
+        numbers = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+        return np.where(np.isnan(numbers), -np.inf, numbers)
+    # Mixed or missing values: compare as text, with missing values first
+    return np.array(['' if is_missing(value) else str(value) for value in values], dtype=object)
+
+
+class NotificationsTableModel(QAbstractTableModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.columns = []
+        self.values = []
+        self.keys = []
+        self.buckets = np.array([], dtype=np.int64)
+        self.brushes = [None] + [QBrush(QColor(color)) for color in AGING_COLORS[1:]]
+        self.row_count = 0
+
+    def set_notifications(self, notifications):
+        """Show a DataFrame returned by dashboard_data.fetch_notifications."""
+        self.beginResetModel()
+        self.columns = [column for column in notifications.columns if column.lower() != 'id']
+        self.values = [notifications[column].to_numpy() for column in self.columns]
+        self.keys = [None] * len(self.columns)  # sort keys, computed the first time a column is sorted
+        self.buckets = aging_buckets(notifications['working_days'].to_numpy(dtype=np.int64))
+        self.row_count = len(notifications)
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            value = self.values[index.column()][index.row()]
+            return '' if is_missing(value) else str(value)
+        if role == Qt.BackgroundRole:
+            return self.brushes[self.buckets[index.row()]]
+        if role == SORT_ROLE:
+            column = index.column()
+            if self.keys[column] is None:
+                self.keys[column] = sort_keys(self.columns[column], self.values[column]).tolist()
+            return self.keys[column][index.row()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section]
+        return section + 1
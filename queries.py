@@ -0,0 +1,235 @@
+# queries.py
+# SQL issued by the app against the records table, kept in one place so that
+# query_plan_check.py can run EXPLAIN QUERY PLAN on every one of them.
+from db_schema import RECORD_FIELDS, STATI
+# derived_fields keeps its SQL next to the columns it computes; checked here all the same
+from derived_fields import DERIVED_BATCH, DERIVED_BATCH_IDS, RECORD_IDS_FLOTTA, UPDATE_DERIVED_FIELDS
+
+# Dati tab, newest first, one page at a time (keyset pagination on id)
+RECORDS_FIRST_PAGE = f'SELECT {RECORD_FIELDS} FROM records ORDER BY id DESC LIMIT ?'
+
+RECORDS_PAGE = f'SELECT {RECORD_FIELDS} FROM records WHERE id < ? ORDER BY id DESC LIMIT ?'
+
+RECORDS_NEWER = f'SELECT {RECORD_FIELDS} FROM records WHERE id > ? ORDER BY id DESC'
+
+RECORD_BY_ID = f'SELECT {RECORD_FIELDS} FROM records WHERE id = ?'
+
+MAX_RECORD_ID = 'SELECT COALESCE(MAX(id), 0) FROM records'
+
+RECORD_IDS_AFTER = 'SELECT id FROM records WHERE id > ?'
+
+COUNT_SAME_INCARICO = '''
+    SELECT COUNT(*) FROM records WHERE targa = ? AND entrata = ? AND data_incarico = ?
+'''
+
+COUNT_SAME_ENTRATA = '''
+    SELECT COUNT(*) FROM records WHERE targa = ? AND entrata = ?
+'''
+
+# Records opened for a change carry their version (see db_schema.migrate_row_versions)
+RECORDS_BY_TARGA = f'SELECT {RECORD_FIELDS}, version, updated_at FROM records WHERE targa = ?'
+
+RECORD_FOR_UPDATE = f'SELECT {RECORD_FIELDS}, version, updated_at FROM records WHERE id = ?'
+
+INSERT_RECORD = '''
+    INSERT INTO records (flotta, targa, modello, entrata, data_incarico,
+                         stato, gg_entrata_data_incarico, prev_uscita)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+UPDATE_RECORD = '''
+    UPDATE records
+    SET ditta = ?, inizio_mecc = ?, fine_mecc = ?, inizio_carr = ?, fine_carr = ?,
+        pezzi_carr = ?, stato = ?, note = ?,
+        gg_inizio_meccanica = ?, gg_inizio_carr = ?,
+        gg_lavorazione_mecc = ?, gg_lavorazione_carr = ?, downtime = ?,
+        data_consegnata = ?
+    WHERE id = ? AND version = ?
+'''
+
+DELETE_RECORD = '''
+    DELETE FROM records WHERE id = ? AND version = ?
+'''
+
+# Notifiche tab: open records in a colored aging bucket (see records_aging.py), oldest first.
+# CROSS JOIN keeps records_aging as the outer loop, so the bucket index drives the query.
+NOTIFICATIONS = f'''
+    SELECT {RECORD_FIELDS}, records_aging.working_days
+    FROM records_aging CROSS JOIN records ON records.id = records_aging.record_id
+    WHERE records_aging.bucket > 0
+    ORDER BY records_aging.bucket DESC, records_aging.working_days DESC
+'''
+
+# Search through the records_fts trigram index (see search_index.py)
+NOTIFICATIONS_MATCH = f'''
+    SELECT {RECORD_FIELDS}, records_aging.working_days
+    FROM records_aging CROSS JOIN records ON records.id = records_aging.record_id
+    WHERE records_aging.bucket > 0
+    AND records.id IN (SELECT rowid FROM records_fts WHERE records_fts MATCH ?)
+    ORDER BY records_aging.bucket DESC, records_aging.working_days DESC
+'''
+
+# Fallback for search terms too short for the trigram index, or without FTS5
+NOTIFICATIONS_SEARCH = f'''
+    SELECT {RECORD_FIELDS}, records_aging.working_days
+    FROM records_aging CROSS JOIN records ON records.id = records_aging.record_id
+    WHERE records_aging.bucket > 0
+    AND (flotta LIKE ? OR targa LIKE ? OR ditta LIKE ? OR note LIKE ?)
+    ORDER BY records_aging.bucket DESC, records_aging.working_days DESC
+'''
+
+# The notifications of one flotta, for batch_reports.py: exactly the flotta values in a JSON
+# array, rather than the tab's search over flotta, targa, ditta and note
+NOTIFICATIONS_FLOTTE = f'''
+    SELECT {RECORD_FIELDS}, records_aging.working_days
+    FROM records_aging CROSS JOIN records ON records.id = records_aging.record_id
+    WHERE records_aging.bucket > 0
+    AND records.flotta IN (SELECT value FROM json_each(?))
+    ORDER BY records_aging.bucket DESC, records_aging.working_days DESC
+'''
+
+# Stato Lavorazioni tab: open records plus the ones delivered today. The two halves are
+# a UNION ALL because an OR across them can only be answered with a full table scan.
+# The board is pivoted here: every record gets its column (the position of its stato in
+# STATI, unknown stati are left out) and its row inside that column, in id order, and the
+# aging bucket of open records is read from records_aging (0 for the delivered ones).
+STATI_VALUES = ', '.join(f"({position}, '{stato}')" for position, stato in enumerate(STATI))
+
+STATO_PIVOT = """
+    SELECT stati.col,
+           ROW_NUMBER() OVER (PARTITION BY stati.col ORDER BY board.id) - 1 AS row,
+           CASE WHEN board.stato = 'Lavorazione Carr.'
+                THEN board.targa || ' (' || COALESCE(NULLIF(board.ditta, ''), '---') || ')'
+                ELSE board.targa END AS label,
+           COALESCE(records_aging.bucket, 0) AS bucket
+    FROM board JOIN stati ON stati.stato = board.stato
+    LEFT JOIN records_aging ON records_aging.record_id = board.id
+"""
+
+STATO_BOARD = f'''
+    WITH stati(col, stato) AS (VALUES {STATI_VALUES}),
+    board AS (
+        SELECT id, targa, stato, ditta
+        FROM records
+        WHERE stato != 'Consegnata'
+        UNION ALL
+        SELECT id, targa, stato, ditta
+        FROM records
+        WHERE stato = 'Consegnata' AND data_consegnata_ord = ?
+    )
+    {STATO_PIVOT}
+'''
+
+STATO_BOARD_MATCH = f'''
+    WITH stati(col, stato) AS (VALUES {STATI_VALUES}),
+    hits AS (SELECT rowid FROM records_fts WHERE records_fts MATCH ?),
+    board AS (
+        SELECT id, targa, stato, ditta
+        FROM records
+        WHERE stato != 'Consegnata'
+        AND id IN hits
+        UNION ALL
+        SELECT id, targa, stato, ditta
+        FROM records
+        WHERE stato = 'Consegnata' AND data_consegnata_ord = ?
+        AND id IN hits
+    )
+    {STATO_PIVOT}
+'''
+
+STATO_BOARD_SEARCH = f'''
+    WITH stati(col, stato) AS (VALUES {STATI_VALUES}),
+    board AS (
+        SELECT id, targa, stato, ditta
+        FROM records
+        WHERE stato != 'Consegnata'
+        AND (flotta LIKE ? OR targa LIKE ? OR ditta LIKE ? OR note LIKE ?)
+        UNION ALL
+        SELECT id, targa, stato, ditta
+        FROM records
+        WHERE stato = 'Consegnata' AND data_consegnata_ord = ?
+        AND (flotta LIKE ? OR targa LIKE ? OR ditta LIKE ? OR note LIKE ?)
+    )
+    {STATO_PIVOT}
+'''
+
+STATO_REPORT_ROWS = '''
+    SELECT targa, stato, ditta, COALESCE(records_aging.bucket, 0) AS bucket
+    FROM records LEFT JOIN records_aging ON records_aging.record_id = records.id
+'''
+
+STATO_REPORT_ROWS_FLOTTA = '''
+    SELECT targa, stato, ditta, COALESCE(records_aging.bucket, 0) AS bucket
+    FROM records LEFT JOIN records_aging ON records_aging.record_id = records.id
+    WHERE flotta LIKE ?
+'''
+
+# Exactly the flotta values in a JSON array, for batch_reports.py, in id order like the scans
+# above. CROSS JOIN keeps the values as the outer loop, so that the flotta index is searched
+# once for each instead of the whole table being read in id order.
+STATO_REPORT_ROWS_FLOTTE = '''
+    SELECT targa, stato, ditta, COALESCE(records_aging.bucket, 0) AS bucket
+    FROM json_each(?) AS flotte CROSS JOIN records ON records.flotta = flotte.value
+    LEFT JOIN records_aging ON records_aging.record_id = records.id
+    ORDER BY records.id
+'''
+
+# Estrapola Dati
+EXPORT_ALL = f'SELECT {RECORD_FIELDS} FROM records'
+
+EXPORT_OPEN = f"SELECT {RECORD_FIELDS} FROM records WHERE stato != 'Consegnata'"
+
+EXPORT_FLOTTA = f'SELECT {RECORD_FIELDS} FROM records WHERE flotta = ?'
+
+EXPORT_FLOTTA_CONSEGNATA = f"SELECT {RECORD_FIELDS} FROM records WHERE flotta = ? AND stato = 'Consegnata'"
+
+# The Estrapola Dati exports by name, for data_exporter.py, b2b_cli.py and records_service.py
+EXPORTS = {
+    'all': EXPORT_ALL,
+    'open': EXPORT_OPEN,
+    'flotta': EXPORT_FLOTTA,
+    'flotta_consegnata': EXPORT_FLOTTA_CONSEGNATA,
+}
+
+# Statistiche, from the trigger-maintained counts (see records_counts.py)
+COUNTS_BY_DIMENSION = '''
+    SELECT key1, key2, count FROM records_counts
+    WHERE dimension = ? AND count > 0
+    ORDER BY key1, key2
+'''
+
+# (name, sql, reason a full table scan is acceptable or None)
+CATALOGUE = [
+    ('RECORDS_FIRST_PAGE', RECORDS_FIRST_PAGE, 'walks the rowid backwards and stops after the LIMIT'),
+    ('RECORDS_PAGE', RECORDS_PAGE, None),
+    ('RECORDS_NEWER', RECORDS_NEWER, None),
+    ('RECORD_BY_ID', RECORD_BY_ID, None),
+    ('MAX_RECORD_ID', MAX_RECORD_ID, None),
+    ('RECORD_IDS_AFTER', RECORD_IDS_AFTER, None),
+    ('COUNT_SAME_INCARICO', COUNT_SAME_INCARICO, None),
+    ('COUNT_SAME_ENTRATA', COUNT_SAME_ENTRATA, None),
+    ('RECORDS_BY_TARGA', RECORDS_BY_TARGA, None),
+    ('RECORD_FOR_UPDATE', RECORD_FOR_UPDATE, None),
+    ('INSERT_RECORD', INSERT_RECORD, None),
+    ('UPDATE_RECORD', UPDATE_RECORD, None),
+    ('DELETE_RECORD', DELETE_RECORD, None),
+    ('NOTIFICATIONS', NOTIFICATIONS, None),
+    ('NOTIFICATIONS_MATCH', NOTIFICATIONS_MATCH, None),
+    ('NOTIFICATIONS_SEARCH', NOTIFICATIONS_SEARCH, None),
+    ('NOTIFICATIONS_FLOTTE', NOTIFICATIONS_FLOTTE, None),
+    ('STATO_BOARD', STATO_BOARD, None),
+    ('STATO_BOARD_MATCH', STATO_BOARD_MATCH, None),
+    ('STATO_BOARD_SEARCH', STATO_BOARD_SEARCH, None),
+    ('STATO_REPORT_ROWS', STATO_REPORT_ROWS, 'report over every record'),
+    ('STATO_REPORT_ROWS_FLOTTA', STATO_REPORT_ROWS_FLOTTA, 'substring match on flotta'),
+    ('STATO_REPORT_ROWS_FLOTTE', STATO_REPORT_ROWS_FLOTTE, None),
+    ('EXPORT_ALL', EXPORT_ALL, 'exports every record'),
+    ('EXPORT_OPEN', EXPORT_OPEN, None),
+    ('EXPORT_FLOTTA', EXPORT_FLOTTA, None),
+    ('EXPORT_FLOTTA_CONSEGNATA', EXPORT_FLOTTA_CONSEGNATA, None),
+    ('COUNTS_BY_DIMENSION', COUNTS_BY_DIMENSION, None),
+    ('DERIVED_BATCH', DERIVED_BATCH, None),
+    ('DERIVED_BATCH_IDS', DERIVED_BATCH_IDS, None),
+    ('RECORD_IDS_FLOTTA', RECORD_IDS_FLOTTA, None),
+    ('UPDATE_DERIVED_FIELDS', UPDATE_DERIVED_FIELDS, None),
+]
@@ -0,0 +1,89 @@
+# query_plan_check.py
+# Runs EXPLAIN QUERY PLAN on every query in queries.CATALOGUE and flags full table scans.
+#
+#   python query_plan_check.py [app_database.db]
+#
+# Exits with status 1 when a query not marked as scan-tolerant plans a full table SCAN.
+import re
+import sqlite3
+import sys
+
+from db_connections import connect
+from db_schema import ensure_schema
+from queries import CATALOGUE
+
+# "SCAN records", "SCAN records USING INDEX x" and "SCAN records USING COVERING INDEX x"
+# all visit every row, unless x is a partial index. Scans of virtual tables, subqueries
+# and CTEs are not table scans.
+SCAN = re.compile(r'^SCAN (\w+)(?: AS \w+)?(?: USING (?:COVERING )?INDEX (\w+))?$')
+
+
+def explain(conn, sql):
+    params = [None] * sql.count('?')
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+
+def stored_tables(conn):
+    return [
+        row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND sql NOT LIKE 'CREATE VIRTUAL TABLE%'"
+        )
+    ]
+
+
+def partial_indexes(conn, tables):
+    partial = set()
+    for table in tables:
+        for row in conn.execute(f'PRAGMA index_list({table})'):
+            if row[4]:
+                partial.add(row[1])
+    return partial
+
+
+def is_full_scan(detail, tables, partial):
+    match = SCAN.match(detail)
+    return bool(match) and match.group(1) in tables and match.group(2) not in partial
+
+
+def check_query_plans(conn):
+    """Return a list of (name, plan details, full scans, allowed reason) for every catalogued query."""
+    tables = set(stored_tables(conn))
+    partial = partial_indexes(conn, tables)
+    results = []
+    for name, sql, allowed_reason in CATALOGUE:
+        try:
+            plan = explain(conn, sql)
+        except sqlite3.OperationalError as e:
+            # e.g. the records_fts queries on a sqlite3 build without FTS5
+            plan = [f'not available: {e}']
+        scans = [detail for detail in plan if is_full_scan(detail, tables, partial)]
+        results.append((name, plan, scans, allowed_reason))
+    return results
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    db_path = argv[0] if argv else 'app_database.db'
+    conn = connect(db_path)
+    ensure_schema(conn)
+
+    failures = 0
+    for name, plan, scans, allowed_reason in check_query_plans(conn):
+        if scans and not allowed_reason:
+            status = 'FULL SCAN'
+            failures += 1
+        elif scans:
+            status = f'scan ok ({allowed_reason})'
+        else:
+            status = 'ok'
+        print(f'{name}: {status}')
+        for detail in plan:
+            print(f'    {detail}')
+
+    conn.close()
+    print(f'\n{len(CATALOGUE)} queries checked, {failures} unexpected full table scans')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
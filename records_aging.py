@@ -0,0 +1,138 @@
+# records_aging.py
+# Materialized working-day age of the open records (stato != 'Consegnata').
+#
+# records_aging holds one row per open record: the working days from its data_incarico to
+# the day in records_aging_day (both included, counted on the business_calendar table), and
+# the legend bucket of that age as an index into working_days.AGING_COLORS. Triggers keep
+# it in step with every write to records; refresh_aging rebuilds it in one statement when
+# the calendar day changes (at startup from ensure_schema, then at midnight from
+# records_repository) or the closures of the calendar do. The
+# Notifiche and Stato Lavorazioni tabs and their reports read the age and filter on the
+# indexed bucket instead of recomputing every age in Python on each load.
+import sqlite3
+from datetime import date
+
+from business_calendar import working_days_sql, extend_calendar
+from working_days import AGING_THRESHOLDS
+
+
+def bucket_sql(working_days):
+    """SQL version of working_days.aging_buckets."""
+    cases = ' '.join(
+        f'WHEN {working_days} > {threshold} THEN {bucket}'
+        for bucket, threshold in reversed(list(enumerate(AGING_THRESHOLDS, 1)))
+    )
+    return f'CASE {cases} ELSE 0 END'
+
+
+AGE_SQL = working_days_sql('data_incarico_ord', '(SELECT day FROM records_aging_day)')
+
+
+def aging_rows_sql(source):
+    """SELECT of (record_id, working_days, bucket) for the rows of source (with id and data_incarico_ord)."""
+    return f'''
+        SELECT id, age, {bucket_sql('age')}
+        FROM (SELECT id, {AGE_SQL} AS age FROM {source})
+    '''
+
+
+# Inserts are covered too: the records_date_ord_insert trigger sets data_incarico_ord on
+# every new record, which fires this trigger. Bulk imports skip that trigger and call
+# age_new_records instead.
+AGING_UPDATE_TRIGGER = f'''
+    CREATE TRIGGER records_aging_update AFTER UPDATE OF data_incarico_ord, stato ON records
+    BEGIN
+        DELETE FROM records_aging WHERE record_id = OLD.id;
+        INSERT INTO records_aging (record_id, working_days, bucket)
+        {aging_rows_sql("(SELECT NEW.id AS id, NEW.data_incarico_ord AS data_incarico_ord WHERE NEW.stato != 'Consegnata')")};
+    END
+'''
+
+
+def create_aging_update_trigger(conn):
+    conn.execute(AGING_UPDATE_TRIGGER)
+
+
+def aging_trigger_outdated(conn):
+    """True if records_aging_update is missing or its stored SQL differs from AGING_UPDATE_TRIGGER."""
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'records_aging_update'"
+    ).fetchone()
+    return row is None or row[0].split() != AGING_UPDATE_TRIGGER.split()
+
+
+def has_aging_table(conn):
+    row = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'records_aging'"
+    ).fetchone()
+    return row[0] > 0
+
+
+def ensure_aging_table(conn):
+    """Create records_aging, its index and its sync triggers, and fill it for today."""
+    if has_aging_table(conn):
+        # A trigger other than AGING_UPDATE_TRIGGER (one from before the business calendar, or
+        # any change to the trigger's SQL) is recreated and every age recomputed
+        outdated = aging_trigger_outdated(conn)
+        if outdated:
+            conn.execute('BEGIN')
+            try:
+                conn.execute('DROP TRIGGER IF EXISTS records_aging_update')
+                create_aging_update_trigger(conn)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+        refresh_aging(conn, force=outdated)
+        return
+    conn.execute('BEGIN')
+    try:
+        conn.execute('CREATE TABLE records_aging_day (day INTEGER NOT NULL)')
+        conn.execute('INSERT INTO records_aging_day (day) VALUES (?)', (date.today().toordinal(),))
+        conn.execute('''
+            CREATE TABLE records_aging (
+                record_id INTEGER PRIMARY KEY,
+                working_days INTEGER NOT NULL,
+                bucket INTEGER NOT NULL
+            )
+        ''')
+        # Notifiche: the colored buckets, oldest first
+        conn.execute('CREATE INDEX records_aging_bucket ON records_aging(bucket, working_days)')
+
+        create_aging_update_trigger(conn)
+        conn.execute('''
+            CREATE TRIGGER records_aging_delete AFTER DELETE ON records
+            BEGIN
+                DELETE FROM records_aging WHERE record_id = OLD.id;
+            END
+        ''')
+        age_new_records(conn, 0)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def age_new_records(conn, last_id):
+    """Add the open records with an id above last_id in one statement."""
+    conn.execute(f'''
+        INSERT OR REPLACE INTO records_aging (record_id, working_days, bucket)
+        {aging_rows_sql("records WHERE stato != 'Consegnata' AND id > ?")}
+    ''', (last_id,))
+
+
+def refresh_aging(conn, today=None, force=False):
+    """Recompute every age when the table was last computed for another day, or if forced; True if it was."""
+    today = today or date.today()
+    if not force and conn.execute('SELECT day FROM records_aging_day').fetchone()[0] == today.toordinal():
+        return False
+    try:
+        extend_calendar(conn, today)
+        conn.execute('UPDATE records_aging_day SET day = ?', (today.toordinal(),))
+        conn.execute('DELETE FROM records_aging')
+        age_new_records(conn, 0)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return True
@@ -0,0 +1,141 @@
+# records_counts.py
+# Record counts by stato, flotta, ditta and stato x flotta, kept up to date by triggers.
+#
+# records_counts has one row per (dimension, key1, key2) with the number of records having
+# those values; key2 is only used by the two-column dimensions and is '' otherwise, and a
+# missing value is counted under ''. Triggers add and subtract on every insert, update and
+# delete, so the statistics never need a GROUP BY over the records table. counts_check.py
+# compares the table against the records and rebuilds it if it ever drifts.
+import sqlite3
+
+# dimension -> records columns it counts by (one or two)
+DIMENSIONS = {
+    'stato': ('stato',),
+    'flotta': ('flotta',),
+    'ditta': ('ditta',),
+    'stato_flotta': ('stato', 'flotta'),
+}
+
+
+def key_sql(prefix, columns):
+    """The (key1, key2) expressions of a dimension for the columns of prefix (NEW., OLD. or '')."""
+    keys = [f"COALESCE({prefix}{column}, '')" for column in columns]
+    return keys + ["''"] * (2 - len(keys))
+
+
+def add_counts_sql(prefix, delta):
+    """Add delta to the counts of the record prefix (NEW. or OLD.) in every dimension."""
+    values = ', '.join(
+        f"('{dimension}', {', '.join(key_sql(prefix, columns))}, {delta})"
+        for dimension, columns in DIMENSIONS.items()
+    )
+    return f'''
+        INSERT INTO records_counts (dimension, key1, key2, count) VALUES {values}
+        ON CONFLICT (dimension, key1, key2) DO UPDATE SET count = count + excluded.count
+    '''
+
+
+def drop_empty_counts_sql(prefix):
+    keys = ', '.join(
+        f"('{dimension}', {', '.join(key_sql(prefix, columns))})" for dimension, columns in DIMENSIONS.items()
+    )
+    return f'DELETE FROM records_counts WHERE count <= 0 AND (dimension, key1, key2) IN (VALUES {keys})'
+
+
+def has_counts_table(conn):
+    row = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'records_counts'"
+    ).fetchone()
+    return row[0] > 0
+
+
+def ensure_counts_table(conn):
+    """Create records_counts and its sync triggers and fill it from the records."""
+    if has_counts_table(conn):
+        return
+    conn.execute('BEGIN')
+    try:
+        conn.execute('''
+            CREATE TABLE records_counts (
+                dimension TEXT NOT NULL,
+                key1 TEXT NOT NULL,
+                key2 TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (dimension, key1, key2)
+            ) WITHOUT ROWID
+        ''')
+        # Skipped during bulk imports (see db_schema.BULK_LOAD_TABLE), which call count_new_records instead
+        conn.execute(f'''
+            CREATE TRIGGER records_counts_insert AFTER INSERT ON records
+            WHEN NOT EXISTS (SELECT 1 FROM records_bulk_load)
+            BEGIN
+                {add_counts_sql('NEW.', 1)};
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER records_counts_update AFTER UPDATE OF stato, flotta, ditta ON records
+            WHEN OLD.stato IS NOT NEW.stato OR OLD.flotta IS NOT NEW.flotta OR OLD.ditta IS NOT NEW.ditta
+            BEGIN
+                {add_counts_sql('OLD.', -1)};
+                {drop_empty_counts_sql('OLD.')};
+                {add_counts_sql('NEW.', 1)};
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER records_counts_delete AFTER DELETE ON records
+            BEGIN
+                {add_counts_sql('OLD.', -1)};
+                {drop_empty_counts_sql('OLD.')};
+            END
+        ''')
+        count_new_records(conn, 0)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+
+def count_new_records(conn, last_id):
+    """Add the records with an id above last_id to the counts, one statement per dimension."""
+    for dimension, columns in DIMENSIONS.items():
+        key1, key2 = key_sql('', columns)
+        conn.execute(f'''
+            INSERT INTO records_counts (dimension, key1, key2, count)
+            SELECT '{dimension}', {key1}, {key2}, COUNT(*) FROM records WHERE id > ? GROUP BY 2, 3
+            ON CONFLICT (dimension, key1, key2) DO UPDATE SET count = count + excluded.count
+        ''', (last_id,))
+
+
+def expected_counts(conn):
+    """{(dimension, key1, key2): count} computed from the records table itself (a full scan)."""
+    expected = {}
+    for dimension, columns in DIMENSIONS.items():
+        key1, key2 = key_sql('', columns)
+        for row in conn.execute(f'SELECT {key1}, {key2}, COUNT(*) FROM records GROUP BY 1, 2'):
+            expected[(dimension, row[0], row[1])] = row[2]
+    return expected
+
+
+def verify_counts(conn):
+    """Return (dimension, key1, key2, stored, expected) for every count that differs from the records."""
+    stored = {
+        (row[0], row[1], row[2]): row[3]
+        for row in conn.execute('SELECT dimension, key1, key2, count FROM records_counts WHERE count != 0')
+    }
+    expected = expected_counts(conn)
+    return [
+        key + (stored.get(key, 0), expected.get(key, 0))
+        for key in sorted(stored.keys() | expected.keys())
+        if stored.get(key, 0) != expected.get(key, 0)
+    ]
+
+
+def rebuild_counts(conn):
+    """Recompute every count from the records table."""
+    try:
+        conn.execute('DELETE FROM records_counts')
+        count_new_records(conn, 0)
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
@@ -0,0 +1,154 @@
+# records_model.py
+# Table model of the Dati tab: the whole records table, newest first, loaded a page at a time.
+#
+# Pages are read with keyset pagination on id (WHERE id < last loaded id), so every page
+# costs the same whatever the scroll position. The view asks for the next page through
+# canFetchMore/fetchMore when the user scrolls near the end of what is loaded. Changes
+# published by the records repository are applied in place: only the affected rows are
+# re-read.
+from bisect import bisect_left
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from db_schema import RECORD_COLUMNS
+
+PAGE_SIZE = 200
+
+COLUMN_LABELS = {
+    'id': 'ID',
+    'flotta': 'Flotta',
+    'targa': 'Targa',
+    'modello': 'Modello',
+    'entrata': 'Entrata',
+    'data_incarico': 'Data Incarico',
+    'ditta': 'Ditta',
+    'inizio_mecc': 'Inizio Mecc.',
+    'fine_mecc': 'Fine Mecc.',
+    'inizio_carr': 'Inizio Carr.',
+    'fine_carr': 'Fine Carr.',
+    'pezzi_carr': 'Pezzi Carr.',
+    'stato': 'Stato',
+    'note': 'Note',
+    'gg_entrata_data_incarico': 'GG Entrata_Incarico',
+    'prev_uscita': 'Prev. Uscita',
+    'gg_inizio_meccanica': 'GG Inizio Mecc.',
+    'gg_inizio_carr': 'GG Inizio Carr.',
+    'gg_lavorazione_mecc': 'GG Lavorazione Mecc.',
+    'gg_lavorazione_carr': 'GG Lavorazione Carr.',
+    'downtime': 'Downtime',
+    'data_consegnata': 'Data Consegnata',
+}
+
+
+class RecordsTableModel(QAbstractTableModel):
+    def __init__(self, repository, page_size=PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.repository = repository
+        self.page_size = page_size
+        self.columns = list(RECORD_COLUMNS)
+        self.rows = []
+        self.keys = []  # -id of every loaded row: ascending, so rows can be found with bisect
+        self.exhausted = False
+        self.reload()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return self.rows[index.row()][index.column()]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return COLUMN_LABELS[self.columns[section]]
+        return section + 1
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        last_id = -self.keys[-1] if self.keys else None
+        if last_id is None:
+            page = self.repository.first_page(self.page_size)
+        else:
+            page = self.repository.page_before(last_id, self.page_size)
+        page = [tuple(row) for row in page]
+        if len(page) < self.page_size:
+            self.exhausted = True
+        if not page:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self.rows.extend(page)
+        self.keys.extend(-row[0] for row in page)
+        self.endInsertRows()
+
+    def reload(self):
+        """Drop everything loaded and start again from the newest records."""
+        self.beginResetModel()
+        self.rows = []
+        self.keys = []
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore()
+
+    def position(self, record_id):
+        position = bisect_left(self.keys, -record_id)
+        if position < len(self.keys) and self.keys[position] == -record_id:
+            return position
+        return None
+
+    def refresh_new_records(self):
+        """Show records added since the newest loaded one at the top of the table."""
+        if not self.keys:
+            self.reload()
+            return
+        new_rows = [tuple(row) for row in self.repository.newer_than(-self.keys[0])]
+        if not new_rows:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(new_rows) - 1)
+        self.rows[0:0] = new_rows
+        self.keys[0:0] = [-row[0] for row in new_rows]
+        self.endInsertRows()
+
+    def refresh_record(self, record_id):
+        """Re-read one record after it was updated, in place."""
+        position = self.position(record_id)
+        if position is None:
+            return
+        row = self.repository.by_id(record_id)
+        if row is None:
+            self.remove_record(record_id)
+            return
+        self.rows[position] = tuple(row)
+        self.dataChanged.emit(self.index(position, 0), self.index(position, len(self.columns) - 1))
+
+    def remove_record(self, record_id):
+        position = self.position(record_id)
+        if position is None:
+            return
+        self.beginRemoveRows(QModelIndex(), position, position)
+        del self.rows[position]
+        del self.keys[position]
+        self.endRemoveRows()
+
+    def apply_change(self, change):
+        """Apply a records_repository.RecordsChange."""
+        if change.reset or len(change.inserted) + len(change.updated) > self.page_size:
+            # Cheaper to start again from the first page
+            self.reload()
+            return
+        for record_id in change.deleted:
+            self.remove_record(record_id)
+        for record_id in change.updated:
+            self.refresh_record(record_id)
+        if change.inserted:
+            self.refresh_new_records()
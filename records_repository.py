@@ -0,0 +1,167 @@
+# records_repository.py
+# Single owner of the reads and writes the Dati tab does on the records table.
+#
+# Every write publishes which record ids were inserted, updated or deleted. Changes are
+# collected for COALESCE_MS and then delivered as one RecordsChange through the changed
+# signal, so a burst of writes (or a whole import) costs the subscribed views one refresh:
+# the Dati model applies the ids in place, the Notifiche and Stato tabs re-query once,
+# and only when they are on screen. The repository also moves the records_aging ages on to
+# the new day at midnight.
+#
+# Updates and deletes are compare-and-swap on the record version: they only apply if the
+# record is still as it was read, otherwise they return a Conflict for the user to resolve.
+from datetime import datetime, time, timedelta
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+import queries
+from db_connections import run_with_retry
+from records_aging import refresh_aging
+from records_store import Conflict, insert_record, update_if_unchanged, delete_if_unchanged, import_file
+
+COALESCE_MS = 100
+
+
+class RecordsChange:
+    """Ids touched by one or more writes. reset means anything may have changed."""
+
+    def __init__(self, inserted=(), updated=(), deleted=(), reset=False):
+        self.inserted = set(inserted)
+        self.updated = set(updated)
+        self.deleted = set(deleted)
+        self.reset = reset
+
+    def merge(self, other):
+        self.reset = self.reset or other.reset
+        self.inserted |= other.inserted
+        # A record inserted in this same window is simply new, however often it was updated since
+        self.updated |= other.updated - self.inserted
+        self.deleted |= other.deleted
+        # Nothing to show for records that are gone
+        self.inserted -= self.deleted
+        self.updated -= self.deleted
+
+    def is_empty(self):
+        return not (self.reset or self.inserted or self.updated or self.deleted)
+
+
+class RecordsRepository(QObject):
+    changed = pyqtSignal(object)  # RecordsChange
+    aging_refreshed = pyqtSignal()
+
+    def __init__(self, conn, executor, parent=None):
+        super().__init__(parent)
+        self.conn = conn
+        # No connection when the records are behind records_service.py (see service_backend.py)
+        self.cursor = conn.cursor() if conn is not None else None
+        self.executor = executor
+        self.pending = RecordsChange()
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(COALESCE_MS)
+        self.timer.timeout.connect(self.flush)
+
+        self.day_timer = QTimer(self)
+        self.day_timer.setSingleShot(True)
+        self.day_timer.timeout.connect(self.refresh_aging)
+        self.schedule_aging_refresh()
+
+    def publish(self, change):
+        self.pending.merge(change)
+        # The window opens with the first change: a steady stream of writes still flushes regularly
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        change, self.pending = self.pending, RecordsChange()
+        if not change.is_empty():
+            self.changed.emit(change)
+
+    def schedule_aging_refresh(self):
+        # A second past midnight, so that date.today() is already the new day
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), time())
+        self.day_timer.start(int((midnight - now).total_seconds() * 1000) + 1000)
+
+    def refresh_aging(self):
+        """Recompute the records_aging ages on the writer thread; aging_refreshed follows if they changed."""
+        self.schedule_aging_refresh()
+        self.executor.submit(refresh_aging, write=True, callback=self.aging_done)
+
+    def aging_done(self, refreshed):
+        if refreshed:
+            self.aging_refreshed.emit()
+
+    # Reads
+
+    def first_page(self, limit):
+        return self.cursor.execute(queries.RECORDS_FIRST_PAGE, (limit,)).fetchall()
+
+    def page_before(self, record_id, limit):
+        return self.cursor.execute(queries.RECORDS_PAGE, (record_id, limit)).fetchall()
+
+    def newer_than(self, record_id):
+        return self.cursor.execute(queries.RECORDS_NEWER, (record_id,)).fetchall()
+
+    def by_id(self, record_id):
+        return self.cursor.execute(queries.RECORD_BY_ID, (record_id,)).fetchone()
+
+    def by_targa(self, targa):
+        return self.cursor.execute(queries.RECORDS_BY_TARGA, (targa,)).fetchall()
+
+    def for_update(self, record_id):
+        return self.cursor.execute(queries.RECORD_FOR_UPDATE, (record_id,)).fetchone()
+
+    def count_same_incarico(self, targa, entrata, data_incarico):
+        return self.cursor.execute(queries.COUNT_SAME_INCARICO, (targa, entrata, data_incarico)).fetchone()[0]
+
+    def count_same_entrata(self, targa, entrata):
+        return self.cursor.execute(queries.COUNT_SAME_ENTRATA, (targa, entrata)).fetchone()[0]
+
+    # Writes
+
+    def conflict(self, record):
+        current = self.for_update(record['id'])
+        # The views are out of date as well: let them catch up with the other workstation
+        if current is None:
+            self.publish(RecordsChange(deleted=[record['id']]))
+        else:
+            self.publish(RecordsChange(updated=[record['id']]))
+        return Conflict(record, current)
+
+    def add_record(self, values):
+        """Insert a record from the INSERT_RECORD values; returns its id."""
+        record_id = run_with_retry(self.conn, insert_record, values)
+        self.publish(RecordsChange(inserted=[record_id]))
+        return record_id
+
+    def update_record(self, record, values):
+        """Update record (read with by_targa or for_update) with the UPDATE_RECORD values.
+
+        Returns None once written, or a Conflict if the record changed since it was read.
+        """
+        if not run_with_retry(self.conn, update_if_unchanged, record['id'], record['version'], values):
+            return self.conflict(record)
+        self.publish(RecordsChange(updated=[record['id']]))
+        return None
+
+    def delete_record(self, record):
+        """Delete record unless it changed since it was read; returns None or a Conflict like update_record."""
+        if not run_with_retry(self.conn, delete_if_unchanged, record['id'], record['version']):
+            return self.conflict(record)
+        self.publish(RecordsChange(deleted=[record['id']]))
+        return None
+
+    def import_file(self, file_path, callback, error_callback):
+        """Import a file on the executor's writer thread; callback(result) gets the bulk_import result."""
+        def finished(result):
+            self.publish(RecordsChange(inserted=result['ids']))
+            callback(result)
+
+        def failed(error):
+            # The chunks committed before the error are in the table: let every view catch up
+            self.publish(RecordsChange(reset=True))
+            error_callback(error)
+
+        return self.executor.submit(import_file, file_path, write=True, callback=finished, error_callback=failed)
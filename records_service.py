@@ -0,0 +1,413 @@
+# records_service.py
+# HTTP/JSON service in front of the records database, for desks that would otherwise open
+# app_database.db over a network share.
+#
+#   python records_service.py [--host 127.0.0.1] [--port 8765] [--slow-query-ms MS] [app_database.db]
+#
+# The service is the only process that opens the database file, so every read and write
+# happens on the disk of the machine it runs on. The desktop app talks to it with
+# DataBaseB2B.py --server http://host:port (see service_client.py and service_backend.py).
+#
+# Requests are served by one thread each, reading through a pool of read-only connections.
+# Writes are handed to a single writer thread, which commits whatever is queued as one
+# transaction: each write runs in its own savepoint, so a refused or failed write is rolled
+# back alone and the others of the batch still commit. With --slow-query-ms, statements
+# taking that long or more are written to the slow-query log (see sql_trace.py).
+#
+# /login checks the app's users table and hands back a session token, which every other
+# request has to send in its Authorization header ('Bearer <token>'). Tokens last until the
+# service restarts and travel in clear text: bind the service to an address reachable only
+# from the office network.
+import json
+import os
+import queue
+import re
+import secrets
+import shutil
+import sys
+import tempfile
+import threading
+from concurrent.futures import Future
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+import pandas as pd
+
+import queries
+from dashboard_data import fetch_notifications, fetch_stato_board
+from db_connections import DB_PATH, connect
+from db_schema import ensure_schema
+from records_aging import refresh_aging
+from records_store import insert_record, update_if_unchanged, delete_if_unchanged, import_file
+from reports import write_stato_report
+from sql_trace import stats
+from streaming_export import EXPORT_FORMATS, export_query
+from users import ensure_users_table, check_login
+
+DEFAULT_PORT = 8765
+
+# Writes committed together at most
+WRITE_BATCH = 64
+
+# Uploaded files are kept here, next to the rejected-rows reports of their import
+IMPORT_DIR = 'imports'
+
+
+def to_json(value):
+    """json.dumps default: numpy values, arrays and DataFrames as plain lists and numbers."""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, pd.DataFrame):
+        return {'columns': list(value.columns), 'rows': value.to_numpy(dtype=object).tolist()}
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def rows_json(rows):
+    columns = list(rows[0].keys()) if rows else []
+    return {'columns': columns, 'rows': [tuple(row) for row in rows]}
+
+
+class WriteQueue:
+    """The single writer thread of the service, with its own writable connection."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name='db-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args, alone=False):
+        """Queue fn(conn, *args) and return a Future of its result.
+
+        Writes that commit on their own (imports, the aging refresh) pass alone=True and
+        run outside any batch.
+        """
+        future = Future()
+        self.queue.put((fn, args, alone, future))
+        return future
+
+    def run(self):
+        conn = connect(self.db_path)
+        pending = None
+        while True:
+            batch = [pending or self.queue.get()]
+            pending = None
+            if batch[0][2]:
+                self.run_alone(conn, *batch[0])
+                continue
+            # Whatever queued up while the last batch was committing goes in this one
+            while len(batch) < WRITE_BATCH:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item[2]:
+                    pending = item
+                    break
+                batch.append(item)
+            self.run_batch(conn, batch)
+
+    def run_alone(self, conn, fn, args, alone, future):
+        try:
+            future.set_result(fn(conn, *args))
+        except Exception as e:
+            conn.rollback()
+            future.set_exception(e)
+
+    def run_batch(self, conn, batch):
+        results = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for fn, args, alone, future in batch:
+                conn.execute('SAVEPOINT record_write')
+                try:
+                    results.append((future, fn(conn, *args), None))
+                except Exception as e:
+                    conn.execute('ROLLBACK TO record_write')
+                    results.append((future, None, e))
+                conn.execute('RELEASE record_write')
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            for fn, args, alone, future in batch:
+                future.set_exception(e)
+            return
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+class RecordsService(ThreadingHTTPServer):
+    daemon_threads = True
+    # Connections waiting to be accepted; the default of 5 refuses a burst from a few desks
+    request_queue_size = 128
+
+    def __init__(self, address, db_path):
+        conn = connect(db_path)
+        ensure_schema(conn)
+        ensure_users_table(conn)
+        conn.close()
+
+        super().__init__(address, RecordsHandler)
+        self.db_path = db_path
+        self.readers = queue.LifoQueue()
+        self.writer = WriteQueue(db_path)
+        self.aged_on = date.today()
+        self.aging_lock = threading.Lock()
+        # Session token: username, for the desks that logged in
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+
+    def open_session(self, username):
+        token = secrets.token_urlsafe(32)
+        with self.sessions_lock:
+            self.sessions[token] = username
+        return token
+
+    def session_user(self, token):
+        with self.sessions_lock:
+            return self.sessions.get(token)
+
+    def read(self, fn, *args):
+        """Run fn(conn, *args) on a pooled read-only connection."""
+        try:
+            conn = self.readers.get_nowait()
+        except queue.Empty:
+            conn = connect(self.db_path, read_only=True, check_same_thread=False)
+        try:
+            return fn(conn, *args)
+        finally:
+            self.readers.put(conn)
+
+    def query(self, sql, params=()):
+        return self.read(lambda conn: conn.execute(sql, params).fetchall())
+
+    def write(self, fn, *args, alone=False):
+        return self.writer.submit(fn, *args, alone=alone).result()
+
+    def age_records(self):
+        # Ages move on with the calendar day; the first request of the day refreshes them
+        with self.aging_lock:
+            if self.aged_on != date.today():
+                self.write(refresh_aging, alone=True)
+                self.aged_on = date.today()
+
+
+class RecordsHandler(BaseHTTPRequestHandler):
+    server_version = 'DataBaseB2B'
+
+    # Routes served without a session token
+    PUBLIC_ROUTES = {'login'}
+
+    ROUTES = [
+        ('GET', r'/records', 'list_records'),
+        ('GET', r'/records/duplicates', 'count_duplicates'),
+        ('GET', r'/records/(\d+)', 'get_record'),
+        ('POST', r'/records', 'add_record'),
+        ('PUT', r'/records/(\d+)', 'update_record'),
+        ('DELETE', r'/records/(\d+)', 'delete_record'),
+        ('GET', r'/notifications', 'notifications'),
+        ('GET', r'/stato-board', 'stato_board'),
+        ('POST', r'/export', 'export'),
+        ('POST', r'/reports/stato', 'stato_report'),
+        ('POST', r'/import', 'import_records'),
+        ('POST', r'/login', 'login'),
+    ]
+
+    def do_GET(self):
+        self.dispatch('GET')
+
+    def do_POST(self):
+        self.dispatch('POST')
+
+    def do_PUT(self):
+        self.dispatch('PUT')
+
+    def do_DELETE(self):
+        self.dispatch('DELETE')
+
+    def dispatch(self, method):
+        url = urlsplit(self.path)
+        self.params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        for route_method, pattern, handler in self.ROUTES:
+            match = re.fullmatch(pattern, url.path)
+            if match and route_method == method:
+                break
+        else:
+            self.send_json({'error': f'{method} {url.path} non previsto'}, status=404)
+            return
+        if handler not in self.PUBLIC_ROUTES and self.session_user() is None:
+            self.send_json({'error': 'Sessione non valida: effettuare di nuovo il login'}, status=401)
+            return
+        try:
+            getattr(self, handler)(*match.groups())
+        except (KeyError, ValueError) as e:
+            self.send_json({'error': f'Richiesta non valida: {e}'}, status=400)
+        except Exception as e:
+            self.log_error('%s %s failed: %r', method, url.path, e)
+            self.send_json({'error': str(e)}, status=500)
+
+    def session_user(self):
+        """User of the session token in the Authorization header; None without a valid one."""
+        scheme, _, token = self.headers.get('Authorization', '').partition(' ')
+        if scheme != 'Bearer' or not token:
+            return None
+        return self.server.session_user(token.strip())
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def read_json(self):
+        return json.loads(self.read_body() or b'{}')
+
+    def send_json(self, value, status=200):
+        body = json.dumps(value, default=to_json, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_file(self, file_path, headers):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(os.path.getsize(file_path)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        with open(file_path, 'rb') as file:
+            shutil.copyfileobj(file, self.wfile)
+
+    # Records
+
+    def list_records(self):
+        if 'targa' in self.params:
+            rows = self.server.query(queries.RECORDS_BY_TARGA, (self.params['targa'],))
+        elif 'newer_than' in self.params:
+            rows = self.server.query(queries.RECORDS_NEWER, (int(self.params['newer_than']),))
+        elif 'before' in self.params:
+            rows = self.server.query(queries.RECORDS_PAGE, (int(self.params['before']), int(self.params['limit'])))
+        else:
+            rows = self.server.query(queries.RECORDS_FIRST_PAGE, (int(self.params['limit']),))
+        self.send_json(rows_json(rows))
+
+    def count_duplicates(self):
+        targa, entrata = self.params['targa'], self.params['entrata']
+        if 'data_incarico' in self.params:
+            rows = self.server.query(queries.COUNT_SAME_INCARICO, (targa, entrata, self.params['data_incarico']))
+        else:
+            rows = self.server.query(queries.COUNT_SAME_ENTRATA, (targa, entrata))
+        self.send_json({'count': rows[0][0]})
+
+    def get_record(self, record_id):
+        rows = self.server.query(queries.RECORD_FOR_UPDATE, (int(record_id),))
+        if not rows:
+            self.send_json({'error': 'Record non trovato'}, status=404)
+            return
+        self.send_json(rows_json(rows))
+
+    def add_record(self):
+        record_id = self.server.write(insert_record, self.read_json()['values'])
+        self.send_json({'id': record_id}, status=201)
+
+    def update_record(self, record_id):
+        body = self.read_json()
+        if self.server.write(update_if_unchanged, int(record_id), body['version'], body['values']):
+            self.send_json({})
+        else:
+            self.send_conflict()
+
+    def delete_record(self, record_id):
+        if self.server.write(delete_if_unchanged, int(record_id), int(self.params['version'])):
+            self.send_json({})
+        else:
+            self.send_conflict()
+
+    def send_conflict(self):
+        # The client reads the record again to show what changed
+        self.send_json({'error': 'Record modificato da un altro utente'}, status=409)
+
+    # Notifiche, Stato Lavorazioni and exports
+
+    def notifications(self):
+        self.server.age_records()
+        self.send_json(self.server.read(fetch_notifications, self.params.get('search', '')))
+
+    def stato_board(self):
+        self.server.age_records()
+        self.send_json(self.server.read(fetch_stato_board, self.params.get('search', '')))
+
+    def export(self):
+        body = self.read_json()
+        query = queries.EXPORTS[body['name']]
+        if body['format'] not in EXPORT_FORMATS:
+            raise ValueError(f"formato {body['format']}")
+        with tempfile.TemporaryDirectory() as folder:
+            file_path = os.path.join(folder, f"export.{body['format']}")
+            exported = self.server.read(export_query, query, body.get('params', []), file_path)
+            if not exported:
+                self.send_json({'exported': 0})
+                return
+            self.send_file(file_path, {'X-Row-Count': str(exported)})
+
+    def stato_report(self):
+        flotta = self.read_json()['flotta']
+        self.server.age_records()
+        with tempfile.TemporaryDirectory() as folder:
+            file_path = self.server.read(write_stato_report, flotta, folder)
+            # The client saves it under the same folder and file name, in its own working directory
+            relative_path = os.path.relpath(file_path, folder)
+            self.send_file(file_path, {'X-File-Name': relative_path.replace(os.sep, '/')})
+
+    def import_records(self):
+        name = os.path.basename(self.params['name'])
+        if not name.lower().endswith(('.xlsx', '.csv')):
+            raise ValueError(f'file {name}')
+        os.makedirs(IMPORT_DIR, exist_ok=True)
+        file_path = os.path.join(IMPORT_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{name}")
+        with open(file_path, 'wb') as file:
+            file.write(self.read_body())
+        self.send_json(self.server.write(import_file, file_path, alone=True))
+
+    def login(self):
+        body = self.read_json()
+        if self.server.read(check_login, body['username'], body['password']):
+            self.send_json({'token': self.server.open_session(body['username'])})
+        else:
+            self.send_json({'error': 'Nome utente o password errati'}, status=401)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    host, port, paths = '127.0.0.1', DEFAULT_PORT, []
+    args = iter(argv)
+    for arg in args:
+        if arg == '--host':
+            host = next(args)
+        elif arg == '--port':
+            port = int(next(args))
+        elif arg == '--slow-query-ms':
+            stats.enable(float(next(args)))
+        else:
+            paths.append(arg)
+    db_path = paths[0] if paths else DB_PATH
+
+    service = RecordsService((host, port), db_path)
+    print(f'Serving {db_path} on http://{host}:{service.server_port}')
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+# records_store.py
+# Writes to the records table shared by the desktop app and records_service.py. Nothing here
+# touches Qt or commits: the caller decides how the statements are grouped in transactions.
+#
+# The derived fields of a written record (see derived_fields.py) are recomputed here, on the
+# calendar of the database the record is written to: a desk in --server mode computes them
+# on a calendar without the closures, which only the service loads.
+import queries
+from derived_fields import recompute_derived_fields
+
+
+class Conflict:
+    """A write refused because the record changed since it was read.
+
+    record is the row the write was based on; current is the row as it is now, or None if
+    it was deleted. Writing again with current instead of record overrides the other change.
+    """
+
+    def __init__(self, record, current):
+        self.record = record
+        self.current = current
+
+
+def insert_record(conn, values):
+    record_id = conn.execute(queries.INSERT_RECORD, values).lastrowid
+    recompute_derived_fields(conn, ids=[record_id])
+    return record_id
+
+
+def update_if_unchanged(conn, record_id, version, values):
+    if conn.execute(queries.UPDATE_RECORD, tuple(values) + (record_id, version)).rowcount != 1:
+        return False
+    recompute_derived_fields(conn, ids=[record_id])
+    return True
+
+
+def delete_if_unchanged(conn, record_id, version):
+    return conn.execute(queries.DELETE_RECORD, (record_id, version)).rowcount == 1
+
+
+def import_file(conn, file_path):
+    """bulk_import.import_records, then the derived fields of the imported records.
+
+    Also returns the ids of the imported records. Unlike the functions above it commits,
+    once per imported chunk and once for the derived fields.
+    """
+    # bulk_import brings pandas and openpyxl: only loaded when a file is imported
+    from bulk_import import import_records
+
+    last_id = conn.execute(queries.MAX_RECORD_ID).fetchone()[0]
+    result = import_records(conn, file_path)
+    recompute_derived_fields(conn, after_id=last_id)
+    conn.commit()
+    result['ids'] = [row[0] for row in conn.execute(queries.RECORD_IDS_AFTER, (last_id,))]
+    return result
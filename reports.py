@@ -0,0 +1,200 @@
+# reports.py
+# Excel reports of the Notifiche and Stato Lavorazioni tabs. These functions do not touch
+# Qt, so the tabs run them on the database executor instead of the GUI thread.
+import json
+import os
+from datetime import datetime
+
+from openpyxl import Workbook
+from openpyxl.styles import PatternFill, Border, Side, Font
+
+import queries
+from working_days import AGING_COLORS
+
+
+def write_notifications_report(df, search_text, folder=None):
+    """Write the Lavorazioni Critiche workbook for the notifications in df; returns the file name.
+
+    The workbook is saved in folder, or in the working directory.
+    """
+    # Ensure 'Id' column is removed before exporting
+    export_df = df.copy()
+    export_df = export_df.loc[:, ~export_df.columns.str.lower().isin(['id', 'color'])]
+    # Reorder columns to place 'data_consegnata' right after 'stato'
+    columns = list(export_df.columns)
+    if 'stato' in columns and 'data_consegnata' in columns:
+        stato_index = columns.index('stato')
+        data_consegnata_index = columns.index('data_consegnata')
+        if data_consegnata_index != stato_index + 1:
+            columns.insert(stato_index + 1, columns.pop(data_consegnata_index))
+        export_df = export_df[columns]
+
+    # Create Excel workbook and worksheet
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Lavorazioni Critiche"
+
+    # Define border style and font style
+    thin_border = Border(left=Side(style='thin'),
+                         right=Side(style='thin'),
+                         top=Side(style='thin'),
+                         bottom=Side(style='thin'))
+    bold_font = Font(bold=True)
+
+    # Write headers with bold font and borders
+    for col_num, header in enumerate(export_df.columns, 1):
+        cell = ws.cell(row=1, column=col_num, value=header)
+        cell.border = thin_border
+        cell.font = bold_font
+
+    # Write data with colors and borders
+    for row_num, row in enumerate(export_df.itertuples(index=False), 2):
+        for col_num, value in enumerate(row, 1):
+            cell = ws.cell(row=row_num, column=col_num, value=value)
+            cell.border = thin_border
+            if hasattr(row, 'working_days'):
+                if row.working_days > 10 and row.working_days <= 15:
+                    cell.fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")  # Yellow
+                elif row.working_days > 15 and row.working_days <= 20:
+                    cell.fill = PatternFill(start_color="FFA500", end_color="FFA500", fill_type="solid")  # Orange
+                elif row.working_days > 20:
+                    cell.fill = PatternFill(start_color="FF0000", end_color="FF0000", fill_type="solid")  # Red
+
+    # Create filename based on search text and current date
+    search_text = search_text.strip().replace(' ', '_')
+    current_date = datetime.now().strftime('%Y%m%d')
+    filename = f'Lavorazioni_Critiche_{search_text}_{current_date}.xlsx' if search_text else f'Lavorazioni_critiche_all_{current_date}.xlsx'
+    if folder:
+        filename = os.path.join(folder, filename)
+    wb.save(filename)
+
+    return filename
+
+
+# Columns of the Veicoli presenti report; the In Carr. columns, one per ditta, go in place of 'Iniziare Carr.'
+STATO_REPORT_COLUMNS = [
+    'Attesa Perizia', 'Autorizzare', 'Iniziare Carr.', 'Attesa Ricambi', 'Collaudo Carr.',
+    'Iniziare Mecc.', 'In Meccanica', 'Altri Lavori', 'Collaudo Mecc.', 'Lavaggio',
+    'Controllo Finale', 'Photoshooting', 'Pronta'
+]
+IN_CARR_POSITION = 2
+
+# stato (stripped, lower case) -> report column; 'lavorazione carr.' goes to the ditta's In Carr. column
+STATO_REPORT_MAP = {
+    'attesa autorizzazione': 'Autorizzare', 'autorizzare': 'Autorizzare',
+    'lavorazione mecc.': 'In Meccanica', 'in meccanica': 'In Meccanica',
+    'pronte': 'Pronta', 'pronta': 'Pronta',
+    'preventivare': 'Attesa Perizia', 'attesa perizia': 'Attesa Perizia',
+    'attesa ricambi': 'Attesa Ricambi',
+    'altri lavori': 'Altri Lavori', 'casa madre': 'Altri Lavori',
+}
+IN_CARR_STATO = 'lavorazione carr.'
+# ditta (lower case) -> the ditta its In Carr. column is named after; None for no column
+IN_CARR_DITTA_MAP = {'hps': 'HPSV', 'hpsv': 'HPSV', 'eusy': None, 'approntamento': None}
+
+
+def in_carr_ditta(ditta):
+    """The ditta whose In Carr. column a ditta's cars go in, None if they are not listed."""
+    if not ditta:
+        return None
+    return IN_CARR_DITTA_MAP.get(ditta.lower(), ditta)
+
+
+def stato_report_column(stato, ditta):
+    """The report column a record goes in ('In Carr. <ditta>' for the carrozzeria), None if it is left out."""
+    stato = stato.strip().lower() if stato else ''
+    if stato == IN_CARR_STATO:
+        ditta = in_carr_ditta(ditta)
+        return None if ditta is None else f'In Carr. {ditta}'
+    return STATO_REPORT_MAP.get(stato)
+
+
+def dated_folder(name, folder=None):
+    """Create (if needed) and return the folder '<name>_<yyyymmdd>' inside folder, or the working directory."""
+    folder_path = os.path.join(folder or os.getcwd(), f"{name}_{datetime.now().strftime('%Y%m%d')}")
+    os.makedirs(folder_path, exist_ok=True)
+    return folder_path
+
+
+def write_stato_report(conn, flotta_filter, folder=None, in_dated_folder=True, flotta_names=None):
+    """Write the Veicoli presenti workbook for a flotta (or "Flotta_All"); returns the file path.
+
+    The workbook goes in a new folder named after the flotta and the day, created inside
+    folder (the working directory by default), or straight into folder if in_dated_folder
+    is False. The records are those whose flotta contains flotta_filter, or with flotta_names
+    those whose flotta is exactly one of the names. They are read in one scan and the
+    workbook is written row by row in xlsxwriter's constant memory mode.
+    """
+    # Loaded with the first report, like openpyxl
+    import xlsxwriter
+
+    folder_path = dated_folder(flotta_filter, folder) if in_dated_folder else folder
+
+    # Define the filename in the format "Flotta dd/mm/yyyy hh:mm" and save it in the created folder
+    formatted_datetime = datetime.now().strftime('%d-%m-%Y %H-%M')  # Using '-' instead of '/' and ':' for a valid filename
+    filename = f"{flotta_filter} {formatted_datetime}.xlsx"
+    file_path = os.path.join(folder_path, filename)
+
+    if flotta_names is not None:
+        rows = conn.execute(queries.STATO_REPORT_ROWS_FLOTTE, (json.dumps(flotta_names),))
+    elif flotta_filter != "Flotta_All":
+        rows = conn.execute(queries.STATO_REPORT_ROWS_FLOTTA, (f'%{flotta_filter}%',))
+    else:
+        rows = conn.execute(queries.STATO_REPORT_ROWS)
+
+    # (targa, bucket) of the cars of every column, in table order. Every ditta of the flotta
+    # gets an In Carr. column, even with no car in carrozzeria: collected in the same scan.
+    entries = {}
+    ditte = set()
+    columns_of = {}  # (stato, ditta) -> report column, worked out once per pair
+    for targa, stato, ditta, bucket in rows:
+        key = (stato, ditta)
+        if key not in columns_of:
+            columns_of[key] = stato_report_column(stato, ditta)
+            ditte.add(in_carr_ditta(ditta))
+        column = columns_of[key]
+        if column is not None and targa is not None:
+            entries.setdefault(column, []).append((targa, bucket))
+
+    in_carr_columns = [f'In Carr. {ditta}' for ditta in sorted(ditte - {None})]
+    stati = STATO_REPORT_COLUMNS[:IN_CARR_POSITION] + in_carr_columns + STATO_REPORT_COLUMNS[IN_CARR_POSITION + 1:]
+    columns = [entries.get(stato, []) for stato in stati]
+    max_entries = max(len(column) for column in columns)
+
+    workbook = xlsxwriter.Workbook(file_path, {'constant_memory': True, 'strings_to_urls': False})
+    try:
+        worksheet = workbook.add_worksheet('Veicoli presenti')
+        header_format = workbook.add_format({'bold': True, 'align': 'center', 'valign': 'vcenter', 'border': 1})
+        title_format = workbook.add_format({'bold': True, 'font_size': 14, 'align': 'center', 'valign': 'vcenter', 'border': 1})
+        count_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center'})  # Bold for the counts only
+        # Car cells by aging bucket (no bold for cell values); Pronta cars are never colored
+        bucket_formats = [workbook.add_format({'bg_color': color, 'border': 1} if color else {'border': 1})
+                          for color in AGING_COLORS]
+        column_formats = [bucket_formats[:1] * len(bucket_formats) if stato == 'Pronta' else bucket_formats
+                          for stato in stati]
+
+        worksheet.merge_range('B2:M2', f'Veicoli {flotta_filter} presenti in RC TOP CAR | Rev. 4.0 | Generato in Data: {datetime.now().strftime("%d/%m/%Y Ore %H:%M")}', title_format)
+        worksheet.write_row(4, 0, stati, header_format)
+
+        # Row by row, as constant memory mode needs
+        for row_index in range(max_entries):
+            for stato_index, column in enumerate(columns):
+                if row_index < len(column):
+                    targa, bucket = column[row_index]
+                    worksheet.write(row_index + 5, stato_index, targa, column_formats[stato_index][bucket])
+
+        counts = [len(column) for column in columns]
+        worksheet.write_row(max_entries + 5, 0, counts, count_format)
+        worksheet.write(max_entries + 6, 0, 'Total', count_format)
+        worksheet.write(max_entries + 6, 1, sum(counts), count_format)
+
+        # Add the legend at the bottom
+        legend_start_row = max_entries + 8
+        worksheet.write(legend_start_row, 0, 'Legenda:', count_format)
+        for color, (legend_col, text) in zip(AGING_COLORS[1:], enumerate(['10-15 giorni', '16-20 giorni', 'Oltre 20 giorni'], 1)):
+            worksheet.write(legend_start_row, legend_col, text,
+                            workbook.add_format({'bg_color': color, 'border': 1, 'align': 'center'}))
+    finally:
+        workbook.close()
+
+    return file_path
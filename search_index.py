@@ -0,0 +1,100 @@
+# search_index.py
+# Trigram full-text index over flotta, targa, ditta and note, used by the search boxes of the
+# Notifiche and Stato Lavorazioni tabs. A substring LIKE '%x%' can never use a b-tree index;
+# an FTS5 trigram index answers the same substring question without scanning the table.
+import sqlite3
+
+SEARCH_COLUMNS = ['flotta', 'targa', 'ditta', 'note']
+
+# The trigram tokenizer can only match strings of at least three characters
+MIN_MATCH_LENGTH = 3
+
+
+def fts5_trigram_available():
+    """True when the sqlite3 library has FTS5 with the trigram tokenizer (SQLite 3.34+)."""
+    try:
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE VIRTUAL TABLE probe USING fts5(value, tokenize='trigram')")
+        conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def has_search_index(conn):
+    row = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'records_fts'"
+    ).fetchone()
+    return row[0] > 0
+
+
+def create_search_insert_trigger(conn):
+    # Skipped during bulk imports (see db_schema.BULK_LOAD_TABLE), which call index_new_records instead
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'NEW.{column}' for column in SEARCH_COLUMNS)
+    conn.execute(f'''
+        CREATE TRIGGER records_fts_insert AFTER INSERT ON records
+        WHEN NOT EXISTS (SELECT 1 FROM records_bulk_load)
+        BEGIN
+            INSERT INTO records_fts(rowid, {columns}) VALUES (NEW.id, {new_values});
+        END
+    ''')
+
+
+def index_new_records(conn, last_id):
+    """Index every record with an id above last_id in one statement."""
+    columns = ', '.join(SEARCH_COLUMNS)
+    conn.execute(f'INSERT INTO records_fts(rowid, {columns}) SELECT id, {columns} FROM records WHERE id > ?', (last_id,))
+
+
+def ensure_search_index(conn):
+    """Create the records_fts shadow index and its sync triggers if the sqlite3 build supports it.
+
+    Returns True when the index is available. Without FTS5 the search boxes keep using LIKE.
+    """
+    if has_search_index(conn):
+        return True
+    if not fts5_trigram_available():
+        return False
+
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'NEW.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'OLD.{column}' for column in SEARCH_COLUMNS)
+    conn.execute('BEGIN')
+    try:
+        # External content table: the text lives only in records, records_fts holds the trigram index
+        conn.execute(f'''
+            CREATE VIRTUAL TABLE records_fts USING fts5(
+                {columns}, content='records', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+        create_search_insert_trigger(conn)
+        conn.execute(f'''
+            CREATE TRIGGER records_fts_delete AFTER DELETE ON records
+            BEGIN
+                INSERT INTO records_fts(records_fts, rowid, {columns}) VALUES ('delete', OLD.id, {old_values});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER records_fts_update AFTER UPDATE OF {columns} ON records
+            BEGIN
+                INSERT INTO records_fts(records_fts, rowid, {columns}) VALUES ('delete', OLD.id, {old_values});
+                INSERT INTO records_fts(rowid, {columns}) VALUES (NEW.id, {new_values});
+            END
+        ''')
+        conn.execute("INSERT INTO records_fts(records_fts) VALUES ('rebuild')")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return True
+
+
+def can_match(search_text, search_index_available):
+    return search_index_available and len(search_text) >= MIN_MATCH_LENGTH
+
+
+def match_expression(search_text):
+    """FTS5 query matching search_text as a substring of any of the indexed columns."""
+    phrase = search_text.replace('"', '""')
+    return f'{{{" ".join(SEARCH_COLUMNS)}}} : "{phrase}"'
@@ -0,0 +1,145 @@
+# service_backend.py
+# The desktop app's executor and records repository when the database is behind
+# records_service.py: the same interfaces as DatabaseExecutor and RecordsRepository, with
+# every database call made through a service_client.ServiceClient.
+#
+# The app only sees the changes made from its own window: writes from other desks show up
+# when a view re-loads, as the Notifiche and Stato tabs do whenever they are shown.
+import os
+
+import numpy as np
+
+import queries
+from db_executor import DatabaseExecutor
+from db_schema import RECORD_COLUMNS
+from records_repository import RecordsRepository, RecordsChange
+from service_client import ServiceClient
+from streaming_export import export_format
+
+
+# The executor tasks of the Notifiche, Stato Lavorazioni and Estrapola Dati views, run by the
+# service instead. Each takes the client in place of the connection and returns what the
+# local function returns.
+
+def remote_notifications(client, search_text=''):
+    # Loaded here, like in dashboard_data, so that pandas is imported on a worker thread
+    import pandas as pd
+
+    result = client.get('/notifications', search=search_text)
+    notifications = pd.DataFrame(result['rows'], columns=result['columns'], dtype=object)
+    notifications['working_days'] = notifications['working_days'].astype(np.int64)
+    return notifications
+
+
+def remote_stato_board(client, search_filter=''):
+    board = client.get('/stato-board', search=search_filter)
+    for name in ('columns', 'rows', 'column_counts'):
+        board[name] = np.asarray(board[name], dtype=np.int64)
+    for name in ('labels', 'colors'):
+        board[name] = np.asarray(board[name], dtype=object)
+    return board
+
+
+EXPORT_NAMES = {query: name for name, query in queries.EXPORTS.items()}
+
+
+def remote_export(client, query, params, file_path):
+    headers, file_path = client.download('POST', '/export', file_path, body={
+        'name': EXPORT_NAMES[query], 'params': list(params), 'format': export_format(file_path),
+    })
+    return int(headers['X-Row-Count']) if headers else 0
+
+
+def remote_stato_report(client, flotta_filter):
+    # Saved in the working directory under the folder and file name the service gave it
+    headers, file_path = client.download('POST', '/reports/stato', body={'flotta': flotta_filter})
+    return os.path.abspath(file_path)
+
+
+def remote_refresh_aging(client):
+    # The service refreshes the ages itself on the first request of the day: reload the views
+    return True
+
+
+# By module and function name, so that the modules of the local tasks (and pandas or
+# openpyxl with them) are not imported just to look them up
+REMOTE_CALLS = {
+    'records_aging.refresh_aging': remote_refresh_aging,
+    'records_store.import_file': ServiceClient.import_file,
+    'dashboard_data.fetch_notifications': remote_notifications,
+    'dashboard_data.fetch_stato_board': remote_stato_board,
+    'streaming_export.export_query': remote_export,
+    'reports.write_stato_report': remote_stato_report,
+}
+
+
+def task_name(fn):
+    return f'{fn.__module__}.{fn.__name__}'
+
+
+class ServiceExecutor(DatabaseExecutor):
+    """DatabaseExecutor running the REMOTE_CALLS counterpart of each task, with the client as connection."""
+
+    def __init__(self, client, readers=4, parent=None):
+        super().__init__(None, readers, parent)
+        self.client = client
+
+    def run_task(self, token, fn, args, write):
+        remote = REMOTE_CALLS.get(task_name(fn))
+        if remote is None:
+            # Tasks that do not touch the database, like saving the Notifiche report
+            return fn(None, *args)
+        return remote(self.client, *args)
+
+
+class ServiceRecordsRepository(RecordsRepository):
+    def __init__(self, client, executor, parent=None):
+        super().__init__(None, executor, parent)
+        self.client = client
+
+    # Reads
+
+    def first_page(self, limit):
+        return self.client.first_page(limit)
+
+    def page_before(self, record_id, limit):
+        return self.client.page_before(record_id, limit)
+
+    def newer_than(self, record_id):
+        return self.client.newer_than(record_id)
+
+    def by_id(self, record_id):
+        row = self.client.for_update(record_id)
+        # Without the version columns, like RECORD_BY_ID
+        return row[:len(RECORD_COLUMNS)] if row is not None else None
+
+    def by_targa(self, targa):
+        return self.client.by_targa(targa)
+
+    def for_update(self, record_id):
+        return self.client.for_update(record_id)
+
+    def count_same_incarico(self, targa, entrata, data_incarico):
+        return self.client.count_duplicates(targa=targa, entrata=entrata, data_incarico=data_incarico)
+
+    def count_same_entrata(self, targa, entrata):
+        return self.client.count_duplicates(targa=targa, entrata=entrata)
+
+    # Writes
+
+    def add_record(self, values):
+        record_id = self.client.add_record(values)
+        self.publish(RecordsChange(inserted=[record_id]))
+        return record_id
+
+    def update_record(self, record, values):
+        if not self.client.update_record(record['id'], record['version'], values):
+            return self.conflict(record)
+        self.publish(RecordsChange(updated=[record['id']]))
+        return None
+
+    def delete_record(self, record):
+        if not self.client.delete_record(record['id'], record['version']):
+            return self.conflict(record)
+        self.publish(RecordsChange(deleted=[record['id']]))
+        return None
@@ -0,0 +1,174 @@
+# service_client.py
+# Client side of records_service.py, with the standard library only. Nothing here touches
+# Qt: the calls block, and the desktop app makes them from the worker threads of
+# service_backend.ServiceExecutor or, for the short record reads and writes, from the GUI
+# thread as it does with a local file.
+import json
+import os
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+TIMEOUT_S = 60
+
+# Downloads are copied to disk in blocks of this size
+DOWNLOAD_BLOCK = 1024 * 1024
+
+
+class ServiceError(Exception):
+    """A request the service refused or could not serve; status is the HTTP status, if any."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class ServiceRow(tuple):
+    """A row of the service, indexable by position or column name like sqlite3.Row."""
+
+    def __new__(cls, columns, values):
+        row = super().__new__(cls, values)
+        row.columns = columns
+        return row
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return super().__getitem__(self.columns.index(key))
+        return super().__getitem__(key)
+
+    def keys(self):
+        return list(self.columns)
+
+
+def service_rows(result):
+    return [ServiceRow(result['columns'], values) for values in result['rows']]
+
+
+class ServiceClient:
+    def __init__(self, base_url, timeout=TIMEOUT_S):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        # Session token of records_service.py, set by login
+        self.token = None
+
+    def open(self, method, path, params=None, body=None, data=None, headers=None):
+        url = self.base_url + path
+        if params:
+            url += '?' + urlencode(params)
+        headers = dict(headers or {})
+        if self.token is not None:
+            headers['Authorization'] = f'Bearer {self.token}'
+        if body is not None:
+            data = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        request = Request(url, data=data, headers=headers, method=method)
+        try:
+            return urlopen(request, timeout=self.timeout)
+        except HTTPError as e:
+            try:
+                message = json.load(e)['error']
+            except (ValueError, KeyError):
+                message = e.reason
+            raise ServiceError(message, e.code) from None
+        except OSError as e:
+            # URLError, or the connection dropped while waiting for the response
+            reason = e.reason if isinstance(e, URLError) else e
+            raise ServiceError(f'Servizio {self.base_url} non raggiungibile: {reason}') from None
+
+    def request(self, method, path, params=None, body=None, data=None):
+        """JSON request; returns (status, decoded JSON response)."""
+        with self.open(method, path, params, body, data) as response:
+            return response.status, json.load(response)
+
+    def get(self, path, **params):
+        return self.request('GET', path, params)[1]
+
+    def download(self, method, path, file_path=None, body=None):
+        """Save the file sent back by the service; returns (response headers, file path).
+
+        Without file_path the file is saved at the relative path in the X-File-Name header.
+        It is written under a temporary name and renamed at the end, like streaming_export
+        does. A JSON response means the service had no file to send: nothing is written and
+        (None, None) is returned.
+        """
+        with self.open(method, path, body=body) as response:
+            if response.headers.get_content_type() == 'application/json':
+                return None, None
+            if file_path is None:
+                file_path = os.path.normpath(response.headers['X-File-Name'])
+                if os.path.isabs(file_path) or file_path.startswith('..'):
+                    raise ServiceError(f'Nome di file non valido: {file_path}')
+                folder_path = os.path.dirname(file_path)
+                if folder_path:
+                    os.makedirs(folder_path, exist_ok=True)
+            temp_path = f'{file_path}.part'
+            try:
+                with open(temp_path, 'wb') as file:
+                    while block := response.read(DOWNLOAD_BLOCK):
+                        file.write(block)
+                os.replace(temp_path, file_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            return response.headers, file_path
+
+    # Records
+
+    def first_page(self, limit):
+        return service_rows(self.get('/records', limit=limit))
+
+    def page_before(self, record_id, limit):
+        return service_rows(self.get('/records', before=record_id, limit=limit))
+
+    def newer_than(self, record_id):
+        return service_rows(self.get('/records', newer_than=record_id))
+
+    def by_targa(self, targa):
+        return service_rows(self.get('/records', targa=targa))
+
+    def for_update(self, record_id):
+        try:
+            return service_rows(self.get(f'/records/{record_id}'))[0]
+        except ServiceError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def count_duplicates(self, **params):
+        return self.get('/records/duplicates', **params)['count']
+
+    def add_record(self, values):
+        return self.request('POST', '/records', body={'values': list(values)})[1]['id']
+
+    def update_record(self, record_id, version, values):
+        """True once written, False if the record is no longer at version."""
+        return self.if_unchanged('PUT', f'/records/{record_id}', body={'version': version, 'values': list(values)})
+
+    def delete_record(self, record_id, version):
+        return self.if_unchanged('DELETE', f'/records/{record_id}', {'version': version})
+
+    def if_unchanged(self, method, path, params=None, body=None):
+        try:
+            self.request(method, path, params, body)
+        except ServiceError as e:
+            if e.status == 409:
+                return False
+            raise
+        return True
+
+    def import_file(self, file_path):
+        with open(file_path, 'rb') as file:
+            data = file.read()
+        return self.request('POST', '/import', {'name': os.path.basename(file_path)}, data=data)[1]
+
+    def login(self, username, password):
+        """True once logged in; every later request then sends the session token."""
+        try:
+            result = self.request('POST', '/login', body={'username': username, 'password': password})[1]
+        except ServiceError as e:
+            if e.status == 401:
+                return False
+            raise
+        self.token = result['token']
+        return True
@@ -0,0 +1,238 @@
+# sql_trace.py
+# Timing of the SQL statements the app runs, to find the queries behind a frozen window.
+#
+# Once stats.enable() is called, db_connections.connect opens TracedConnection connections.
+# Every statement run through them, by conn.execute or by a cursor, is timed from execute to
+# its last fetched row, together with the rows it returned (or changed), the thread it ran
+# on and the app function that ran it. stats keeps, for every statement and caller, totals
+# since the start plus the latencies of its last WINDOW runs, from which the Diagnostica
+# tab draws percentiles and histograms. Statements slower than slow_ms are also appended to
+# the slow-query log. Nothing here touches Qt.
+import json
+import sqlite3
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+
+SLOW_QUERY_MS = 250
+SLOW_LOG_PATH = 'slow_queries.log'
+
+# Latest runs of each statement the percentiles and histograms are computed on
+WINDOW = 500
+# Upper bounds in ms of the histogram buckets; one more bucket takes the slower runs
+HISTOGRAM_MS = [1, 5, 10, 50, 100, 500, 1000]
+
+
+def statement_text(sql):
+    """sql on one line, so that the same statement is counted once however it was indented."""
+    return ' '.join(sql.split())
+
+
+def caller():
+    """'module.function:line' of the innermost app code running the statement."""
+    frame = sys._getframe(1)
+    while frame is not None and frame.f_globals.get('__name__') == __name__:
+        frame = frame.f_back
+    if frame is None:
+        return '?'
+    return f"{frame.f_globals.get('__name__')}.{frame.f_code.co_name}:{frame.f_lineno}"
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class StatementStats:
+    def __init__(self, sql, caller):
+        self.sql = sql
+        self.caller = caller
+        self.count = 0
+        self.errors = 0
+        self.gui_count = 0   # runs on the GUI thread, the ones that freeze the window
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.recent = deque(maxlen=WINDOW)
+
+    def add(self, ms, rows, on_gui, failed):
+        self.count += 1
+        self.errors += failed
+        self.gui_count += on_gui
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.rows += rows
+        self.recent.append(ms)
+
+    def snapshot(self):
+        recent = sorted(self.recent)
+        histogram = [0] * (len(HISTOGRAM_MS) + 1)
+        for ms in recent:
+            histogram[bisect_left(HISTOGRAM_MS, ms)] += 1
+        return {
+            'sql': self.sql,
+            'caller': self.caller,
+            'count': self.count,
+            'errors': self.errors,
+            'gui_count': self.gui_count,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3),
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': round(percentile(recent, 0.5), 3),
+            'p95_ms': round(percentile(recent, 0.95), 3),
+            'rows': self.rows,
+            'histogram': histogram,
+        }
+
+
+class SqlStats:
+    def __init__(self):
+        self.enabled = False
+        self.slow_ms = SLOW_QUERY_MS
+        self.log_path = SLOW_LOG_PATH
+        self.lock = threading.Lock()
+        self.statements = {}  # (sql, caller) -> StatementStats
+
+    def enable(self, slow_ms=SLOW_QUERY_MS, log_path=SLOW_LOG_PATH):
+        """Trace the connections opened from now on; statements of slow_ms or more go to log_path."""
+        self.slow_ms = slow_ms
+        self.log_path = log_path
+        self.enabled = True
+
+    def record(self, sql, caller, ms, rows, failed=False):
+        thread = threading.current_thread()
+        on_gui = thread is threading.main_thread()
+        with self.lock:
+            statement = self.statements.get((sql, caller))
+            if statement is None:
+                statement = self.statements[(sql, caller)] = StatementStats(sql, caller)
+            statement.add(ms, rows, on_gui, failed)
+            log_path = self.log_path if ms >= self.slow_ms else None
+        # Written outside the lock, so that the statements of other threads do not wait for the disk
+        if log_path:
+            line = (f"{datetime.now().isoformat(sep=' ', timespec='milliseconds')}\t{ms:.1f} ms\t"
+                    f"{rows} rows\t{thread.name}\t{caller}\t{'FAILED ' if failed else ''}{sql}\n")
+            with open(log_path, 'a', encoding='utf-8') as log:
+                log.write(line)
+
+    def snapshot(self):
+        """Statistics of every statement as dicts, the most time consuming in total first."""
+        with self.lock:
+            statements = [statement.snapshot() for statement in self.statements.values()]
+        return sorted(statements, key=lambda statement: -statement['total_ms'])
+
+    def reset(self):
+        with self.lock:
+            self.statements.clear()
+
+    def dump(self, file_path):
+        """Write the statistics to a JSON file, to be sent in with a report of a slow window."""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'slow_ms': self.slow_ms,
+                'histogram_ms': HISTOGRAM_MS,
+                'statements': self.snapshot(),
+            }, f, indent=2)
+        return file_path
+
+
+stats = SqlStats()
+
+
+class TracedCursor(sqlite3.Cursor):
+    def __init__(self, connection):
+        super().__init__(connection)
+        self.trace = None  # [sql, caller, seconds, rows] of the statement still being fetched
+
+    def run(self, sql, method, *args):
+        self.finish()
+        self.trace = [statement_text(sql), caller(), 0.0, 0]
+        start = time.perf_counter()
+        try:
+            method(*args)
+        except BaseException:
+            self.trace[2] += time.perf_counter() - start
+            self.finish(failed=True)
+            raise
+        self.trace[2] += time.perf_counter() - start
+        if self.description is None:
+            # Not a query: nothing to fetch, the rows are the ones it changed
+            self.trace[3] = max(self.rowcount, 0)
+            self.finish()
+        return self
+
+    def finish(self, failed=False):
+        if self.trace is not None:
+            sql, statement_caller, seconds, rows = self.trace
+            self.trace = None
+            stats.record(sql, statement_caller, seconds * 1000, rows, failed)
+
+    def fetched(self, start, rows, exhausted):
+        if self.trace is not None:
+            self.trace[2] += time.perf_counter() - start
+            self.trace[3] += rows
+            if exhausted:
+                self.finish()
+
+    def execute(self, sql, parameters=()):
+        return self.run(sql, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.run(sql, super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.run(sql_script, super().executescript, sql_script)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self.fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self.fetched(start, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self.fetched(start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self.fetched(start, 0, True)
+            raise
+        self.fetched(start, 1, False)
+        return row
+
+    def close(self):
+        self.finish()
+        super().close()
+
+    def __del__(self):
+        # A statement whose rows were not all fetched ends with its cursor
+        self.finish()
+
+
+class TracedConnection(sqlite3.Connection):
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
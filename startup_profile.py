@@ -0,0 +1,79 @@
+# startup_profile.py
+# Where the startup time of the app goes:
+#
+#   python DataBaseB2B.py --startup-profile
+#
+# prints to stderr, once the main window is on screen, the milliseconds of every startup
+# phase and of the slowest module imports: self time (the module's own code) and
+# cumulative time (with the modules it imported), as python -X importtime does. Only
+# imports made on the GUI thread are timed.
+import builtins
+import importlib.util
+import sys
+import threading
+import time
+
+
+def module_name(name, globals, level):
+    """Absolute name of the module an import statement asks for; None if it cannot be resolved."""
+    if level == 0:
+        return name
+    try:
+        return importlib.util.resolve_name('.' * level + name, (globals or {}).get('__package__'))
+    except (ImportError, ValueError):
+        return None
+
+
+class StartupProfile:
+    def __init__(self, enabled):
+        """A profile that records nothing unless enabled; import timing starts right away."""
+        self.enabled = enabled
+        self.started = self.last_mark = time.perf_counter()
+        self.phases = []    # (name, ms)
+        self.imports = []   # (module, depth, self ms, cumulative ms), in the order they finished
+        self.nested = []    # time spent in nested imports, one entry per import in progress
+        self.thread = threading.get_ident()
+        self.original_import = builtins.__import__
+        if enabled:
+            builtins.__import__ = self.timed_import
+
+    def mark(self, phase):
+        """Record the time since the previous mark as phase."""
+        now = time.perf_counter()
+        if self.enabled:
+            self.phases.append((phase, (now - self.last_mark) * 1000))
+        self.last_mark = now
+
+    def timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        module = module_name(name, globals, level)
+        if threading.get_ident() != self.thread or module is None or module in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+
+        self.nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self.nested.pop()
+            if self.nested:
+                self.nested[-1] += elapsed
+            self.imports.append((module, len(self.nested), (elapsed - nested) * 1000, elapsed * 1000))
+
+    def report(self, file=None, top=25):
+        """Stop timing imports and print the phases and the top slowest imports."""
+        if not self.enabled:
+            return
+        builtins.__import__ = self.original_import
+        self.enabled = False
+        file = file or sys.stderr
+
+        print('Startup phases (ms):', file=file)
+        for phase, ms in self.phases:
+            print(f'  {ms:9.1f}  {phase}', file=file)
+        print(f'  {(self.last_mark - self.started) * 1000:9.1f}  total', file=file)
+
+        print(f'Slowest of {len(self.imports)} imports (ms):', file=file)
+        print(f'  {"self":>9}  {"cumulative":>10}  module', file=file)
+        for module, depth, self_ms, cumulative_ms in sorted(self.imports, key=lambda entry: -entry[3])[:top]:
+            print(f'  {self_ms:9.1f}  {cumulative_ms:10.1f}  {"  " * depth}{module}', file=file)
@@ -1,12 +1,26 @@
 # statistics_tab.py
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QTextEdit
-import sqlite3
+import queries
+from records_counts import DIMENSIONS
+
+DIMENSION_TITLES = {
+    'stato': 'By stato',
+    'flotta': 'By flotta',
+    'ditta': 'By ditta',
+    'stato_flotta': 'By stato and flotta',
+}
+
+def fetch_statistics(conn):
+    # Read from records_counts: a few rows per dimension, whatever the size of the records table
+    return {
+        dimension: conn.execute(queries.COUNTS_BY_DIMENSION, (dimension,)).fetchall()
+        for dimension in DIMENSIONS
+    }
 
 class StatisticsTab(QWidget):
-    def __init__(self, conn: sqlite3.Connection):
+    def __init__(self, executor):
         super().__init__()
-        self.conn = conn
-        self.cursor = self.conn.cursor()
+        self.executor = executor
         self.init_ui()
 
     def init_ui(self):
@@ -25,16 +39,18 @@ class StatisticsTab(QWidget):
         self.setLayout(self.layout)
 
     def load_statistics(self):
-        # Example: Get the count of records grouped by 'stato'
-        self.cursor.execute('''
-            SELECT stato, COUNT(*) as count FROM records GROUP BY stato
-        ''')
-        results = self.cursor.fetchall()
+        self.executor.submit(fetch_statistics, callback=self.show_statistics)
 
+    def show_statistics(self, results):
         # Prepare the text to display in the statistics tab
-        stats_text = "Statistics:\n\n"
-        for row in results:
-            stats_text += f"{row['stato']}: {row['count']} records\n"
-        
+        stats_text = "Statistics:\n"
+        for dimension, rows in results.items():
+            stats_text += f"\n{DIMENSION_TITLES[dimension]}:\n"
+            for row in rows:
+                # Records without a value are counted under ''
+                keys = (row['key1'], row['key2'])[:len(DIMENSIONS[dimension])]
+                key = ' / '.join(value or '-' for value in keys)
+                stats_text += f"{key}: {row['count']} records\n"
+
         # Display the statistics in the text edit widget
         self.statistics_text.setText(stats_text)
@@ -0,0 +1,59 @@
+# stato_board_model.py
+# Virtual table model of the Stato Lavorazioni board: one column per stato, the targhe in
+# that stato stacked from the top. The board is pivoted by the query, so the model only
+# keeps the card arrays and a rows x columns grid of card indexes (-1 for an empty cell):
+# empty cells cost nothing and no item object is ever created.
+import numpy as np
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QBrush, QColor
+
+from db_schema import STATI
+
+
+class StatoBoardModel(QAbstractTableModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.labels = np.array([], dtype=object)
+        self.colors = np.array([], dtype=object)
+        self.grid = np.full((0, len(STATI)), -1, dtype=np.int64)
+        self.brushes = {}
+
+    def set_board(self, board):
+        """Show a board returned by dashboard_data.fetch_stato_board."""
+        self.beginResetModel()
+        self.labels = board['labels']
+        self.colors = board['colors']
+        row_count = int(board['column_counts'].max()) if len(board['labels']) else 0
+        self.grid = np.full((row_count, len(STATI)), -1, dtype=np.int64)
+        self.grid[board['rows'], board['columns']] = np.arange(len(board['labels']))
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.grid.shape[0]
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(STATI)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        card = self.grid[index.row(), index.column()]
+        if card < 0:
+            return None
+        if role == Qt.DisplayRole:
+            return self.labels[card]
+        if role == Qt.BackgroundRole:
+            color = self.colors[card]
+            if not color:
+                return None
+            if color not in self.brushes:
+                self.brushes[color] = QBrush(QColor(color))
+            return self.brushes[color]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return STATI[section]
+        return section + 1
@@ -0,0 +1,159 @@
+# streaming_export.py
+# Export of query results to .xlsx, .csv or .jsonl without loading them in memory.
+#
+# Rows are pulled from the sqlite cursor in batches of BATCH_SIZE and written as they come:
+# xlsxwriter in constant_memory mode flushes every row to disk once the next one starts,
+# CSV and JSON Lines are plain streams. Column order is fixed on the fly from the cursor
+# description, so memory use does not depend on the number of exported records.
+import csv
+import json
+import os
+from operator import itemgetter
+
+BATCH_SIZE = 2000
+
+# Rows per worksheet allowed by Excel, header included; longer exports continue on a new sheet
+XLSX_MAX_ROWS = 1048576
+
+EXPORT_FORMATS = {
+    'xlsx': 'Excel (.xlsx)',
+    'csv': 'CSV (.csv)',
+    'jsonl': 'JSON Lines (.jsonl)',
+}
+
+# File names of the Estrapola Dati exports, by queries.EXPORTS name
+EXPORT_FILE_NAMES = {
+    'all': 'DataBaseB2B',
+    'open': 'DataBaseB2B_lavorazione',
+    'flotta': 'DataBaseB2B_{flotta}',
+    'flotta_consegnata': 'DataBaseB2B_{flotta}_consegnata',
+}
+
+
+def export_file_name(name, flotta=None):
+    return EXPORT_FILE_NAMES[name].format(flotta=flotta)
+
+
+def export_columns(columns):
+    """Exported columns: no 'id', and 'data_consegnata' placed right before 'note'."""
+    columns = [col for col in columns if col != 'id']
+    if 'data_consegnata' in columns:
+        columns.remove('data_consegnata')
+        if 'note' in columns:
+            columns.insert(columns.index('note'), 'data_consegnata')
+        else:
+            columns.append('data_consegnata')
+    return columns
+
+
+def iter_batches(cursor, first_batch, reorder, batch_size):
+    batch = first_batch
+    while batch:
+        yield [reorder(row) for row in batch]
+        batch = cursor.fetchmany(batch_size)
+
+
+def write_xlsx_row(worksheet, row_index, row):
+    # Typed writes skip the type sniffing of worksheet.write(), which would also turn text
+    # starting with '=' into a formula; empty cells are simply not written
+    for col_index, value in enumerate(row):
+        if value is None:
+            continue
+        if isinstance(value, (int, float)):
+            worksheet.write_number(row_index, col_index, value)
+        else:
+            worksheet.write_string(row_index, col_index, str(value))
+
+
+def write_xlsx(file_path, columns, batches):
+    # Only loaded when a workbook is actually written
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(file_path, {'constant_memory': True, 'strings_to_urls': False})
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center'})
+    sheet_number = 0
+    worksheet = None
+    row_index = XLSX_MAX_ROWS
+    try:
+        for batch in batches:
+            for row in batch:
+                if row_index == XLSX_MAX_ROWS:
+                    sheet_number += 1
+                    worksheet = workbook.add_worksheet('Sheet1' if sheet_number == 1 else f'Sheet{sheet_number}')
+                    worksheet.write_row(0, 0, columns, header_format)
+                    row_index = 1
+                write_xlsx_row(worksheet, row_index, row)
+                row_index += 1
+    finally:
+        workbook.close()
+
+
+def write_csv(file_path, columns, batches):
+    # utf-8-sig so that Excel opens accented text correctly
+    with open(file_path, 'w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for batch in batches:
+            writer.writerows(batch)
+
+
+def write_jsonl(file_path, columns, batches):
+    with open(file_path, 'w', encoding='utf-8') as file:
+        for batch in batches:
+            file.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in batch)
+
+
+WRITERS = {
+    'xlsx': write_xlsx,
+    'csv': write_csv,
+    'jsonl': write_jsonl,
+}
+
+
+def export_format(file_path):
+    extension = os.path.splitext(file_path)[1].lstrip('.').lower()
+    if extension not in WRITERS:
+        raise ValueError(f'Formato di esportazione non supportato: .{extension}')
+    return extension
+
+
+def export_query(conn, query, params, file_path, batch_size=BATCH_SIZE):
+    """Stream the result of query into file_path, in the format given by its extension.
+
+    Returns the number of exported rows; when there are none no file is written. The file
+    is written under a temporary name and renamed at the end, so a failed export never
+    leaves a truncated file behind.
+    """
+    writer = WRITERS[export_format(file_path)]
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        first_batch = cursor.fetchmany(batch_size)
+        if not first_batch:
+            return 0
+
+        source_columns = [description[0] for description in cursor.description]
+        columns = export_columns(source_columns)
+        positions = [source_columns.index(col) for col in columns]
+        # itemgetter with a single position returns the bare value, not a tuple
+        reorder = itemgetter(*positions) if len(positions) > 1 else lambda row: (row[positions[0]],)
+
+        row_count = 0
+
+        def counted(batches):
+            nonlocal row_count
+            for batch in batches:
+                row_count += len(batch)
+                yield batch
+
+        temp_path = f'{file_path}.part'
+        try:
+            writer(temp_path, columns, counted(iter_batches(cursor, first_batch, reorder, batch_size)))
+            os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return row_count
+    finally:
+        cursor.close()
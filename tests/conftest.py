@@ -0,0 +1,40 @@
+# tests/conftest.py
+# Every test works on its own database in pytest's tmp_path, never on app_database.db.
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from db_connections import connect  # noqa: E402
+from db_schema import ensure_schema  # noqa: E402
+
+# The database shipped with the app, as it was before the schema migrations
+BASELINE_DB = os.path.join(ROOT, 'app_database.db')
+
+
+@pytest.fixture
+def conn(tmp_path):
+    """A connection to a new database with the latest schema."""
+    conn = connect(str(tmp_path / 'records.db'))
+    ensure_schema(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def baseline_path(tmp_path):
+    """A copy of the shipped database."""
+    path = str(tmp_path / 'baseline.db')
+    shutil.copy(BASELINE_DB, path)
+    return path
+
+
+@pytest.fixture(scope='session')
+def qt_app():
+    # RecordsRepository is a QObject with timers: it needs an application, not a display
+    QtCore = pytest.importorskip('PyQt5.QtCore')
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
@@ -0,0 +1,47 @@
+# tests/test_batch_reports.py
+# The batch reports of a flotta hold its records only, whatever the spelling they were saved with.
+import openpyxl
+import pytest
+
+from batch_reports import flotta_sizes
+from dashboard_data import fetch_flotta_notifications
+from records_store import insert_record
+from reports import write_stato_report
+
+# Months old, so that every record is in the Notifiche
+RECORDS = [
+    ('ALD', 'AB123CD', 'PANDA', '02/01/2024', '03/01/2024', 'Attesa Perizia', 2, None),
+    ('ald ', 'CD456EF', 'PUMA', '02/01/2024', '03/01/2024', 'Attesa Ricambi', 2, None),
+    ('ALDX', 'EF789GH', 'PANDA', '02/01/2024', '03/01/2024', 'Attesa Perizia', 2, None),
+    ('DRIVALIA', 'GH012JK', 'COMPASS', '02/01/2024', '03/01/2024', 'Attesa Perizia', 2, None),
+]
+
+
+@pytest.fixture
+def db_path(conn, tmp_path):
+    for values in RECORDS:
+        insert_record(conn, values)
+    # A note naming another flotta, which the Notifiche search box would match
+    conn.execute("UPDATE records SET note = 'come ALD' WHERE flotta = 'DRIVALIA'")
+    conn.commit()
+    return str(tmp_path / 'records.db')
+
+
+def test_flotte_are_grouped_by_trimmed_upper_case_name(db_path):
+    sizes = flotta_sizes(db_path)
+    assert sorted(sizes) == ['ALD', 'ALDX', 'DRIVALIA']
+    assert sorted(sizes['ALD']['names']) == ['ALD', 'ald ']
+    assert sizes['ALD']['records'] == 2
+
+
+def test_reports_hold_exactly_the_flotta(conn, db_path, tmp_path):
+    names = flotta_sizes(db_path)['ALD']['names']
+
+    notifications = fetch_flotta_notifications(conn, names)
+    assert sorted(notifications['targa']) == ['AB123CD', 'CD456EF']
+
+    file_path = write_stato_report(conn, 'ALD', str(tmp_path), in_dated_folder=False, flotta_names=names)
+    cells = {value for row in openpyxl.load_workbook(file_path).active.iter_rows(values_only=True)
+             for value in row}
+    assert {'AB123CD', 'CD456EF'} <= cells
+    assert not {'EF789GH', 'GH012JK'} & cells
@@ -0,0 +1,48 @@
+# tests/test_derived_fields.py
+# The derived fields of a written record come from the calendar of its database, whatever
+# the desk that wrote it computed.
+from datetime import date
+
+from business_calendar import set_closures
+from records_store import insert_record, update_if_unchanged
+
+# Added on Wednesday 02/10/2024, with the fields a desk unaware of a closure on the 3rd computes
+NEW_RECORD = ('ALD', 'AB123CD', 'PANDA', '01/10/2024', '02/10/2024', 'Attesa Perizia', 2, '16/10/2024')
+
+DERIVED = 'SELECT gg_entrata_data_incarico, prev_uscita, gg_lavorazione_mecc, downtime FROM records WHERE id = ?'
+
+
+def test_writes_recompute_the_derived_fields(conn):
+    set_closures(conn, date(2024, 10, 3), date(2024, 10, 3), 'Chiusura')
+
+    record_id = insert_record(conn, NEW_RECORD)
+    conn.commit()
+    assert tuple(conn.execute(DERIVED, (record_id,)).fetchone()) == (2, '17/10/2024', None, None)
+
+    # Mechanics from Wednesday 02/10 to Friday 04/10, sent with the desk's counts
+    values = ('PIBO', '02/10/2024', '04/10/2024', '', '', 0, 'Lavorazione Mecc.', '', 1, None, 3, None, 3, None)
+    version = conn.execute('SELECT version FROM records WHERE id = ?', (record_id,)).fetchone()[0]
+    assert update_if_unchanged(conn, record_id, version, values)
+    conn.commit()
+    assert tuple(conn.execute(DERIVED, (record_id,)).fetchone()) == (2, '17/10/2024', 2, 2)
+
+
+def test_recomputed_fields_leave_the_version_alone(conn):
+    # Sent without the derived fields: they are filled in, which is not an edit
+    record_id = insert_record(conn, NEW_RECORD[:6] + (None, None))
+    conn.commit()
+    assert tuple(conn.execute('SELECT gg_entrata_data_incarico, prev_uscita, version FROM records WHERE id = ?',
+                              (record_id,)).fetchone()) == (2, '16/10/2024', 1)
+
+    set_closures(conn, date(2024, 10, 3), date(2024, 10, 3), 'Chiusura')
+    prev_uscita, version, updated_at = conn.execute(
+        'SELECT prev_uscita, version, updated_at FROM records WHERE id = ?', (record_id,)
+    ).fetchone()
+    assert prev_uscita == '17/10/2024'
+    assert (version, updated_at) == (1, None)
+
+    # An edit is bumped once, whatever the recompute after it rewrites
+    values = ('PIBO', '02/10/2024', '04/10/2024', '', '', 0, 'Lavorazione Mecc.', '', 1, None, 3, None, 3, None)
+    assert update_if_unchanged(conn, record_id, 1, values)
+    conn.commit()
+    assert conn.execute('SELECT version FROM records WHERE id = ?', (record_id,)).fetchone()[0] == 2
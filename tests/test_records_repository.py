@@ -0,0 +1,65 @@
+# tests/test_records_repository.py
+# Compare-and-swap updates and deletes, and the version trigger behind them.
+import pytest
+
+from records_store import Conflict
+
+NEW_RECORD = ('ALD', 'AB123CD', 'PANDA', '07/10/2024', '08/10/2024', 'Attesa Perizia', 1, '22/10/2024')
+
+
+def update_values(stato='Lavorazione Carr.', note=''):
+    """UPDATE_RECORD values, in its column order."""
+    return ('PIBO', '', '', '09/10/2024', '', 3, stato, note, None, 2, None, None, 2, None)
+
+
+@pytest.fixture
+def repository(conn, qt_app):
+    from records_repository import RecordsRepository
+    return RecordsRepository(conn, executor=None)
+
+
+@pytest.fixture
+def record(repository):
+    return repository.for_update(repository.add_record(NEW_RECORD))
+
+
+def test_update_bumps_the_version(repository, record):
+    assert repository.update_record(record, update_values()) is None
+    current = repository.for_update(record['id'])
+    assert current['version'] == record['version'] + 1
+    assert current['stato'] == 'Lavorazione Carr.'
+    assert current['updated_at'] is not None
+
+
+def test_stale_update_returns_a_conflict(repository, record):
+    assert repository.update_record(record, update_values(note='first desk')) is None
+
+    conflict = repository.update_record(record, update_values(note='second desk'))
+    assert isinstance(conflict, Conflict)
+    assert conflict.record is record
+    assert conflict.current['note'] == 'first desk'
+    assert repository.for_update(record['id'])['note'] == 'first desk'
+
+    # Writing again on top of the current version overrides the other change
+    assert repository.update_record(conflict.current, update_values(note='second desk')) is None
+    assert repository.for_update(record['id'])['note'] == 'second desk'
+
+
+def test_stale_delete_returns_a_conflict(repository, record):
+    assert repository.update_record(record, update_values()) is None
+
+    conflict = repository.delete_record(record)
+    assert isinstance(conflict, Conflict)
+    assert conflict.current['version'] == record['version'] + 1
+    assert repository.for_update(record['id']) is not None
+
+    assert repository.delete_record(conflict.current) is None
+    assert repository.for_update(record['id']) is None
+
+
+def test_update_of_a_deleted_record_returns_a_conflict(repository, record):
+    assert repository.delete_record(record) is None
+
+    conflict = repository.update_record(record, update_values())
+    assert isinstance(conflict, Conflict)
+    assert conflict.current is None
@@ -0,0 +1,68 @@
+# tests/test_records_service.py
+# records_service.py only serves the requests of a desk that logged in.
+import os
+import threading
+
+import pytest
+
+from records_service import RecordsHandler, RecordsService
+from service_client import ServiceClient, ServiceError
+
+NEW_RECORD = ('ALD', 'AB123CD', 'PANDA', '07/10/2024', '08/10/2024', 'Attesa Perizia', 1, '22/10/2024')
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(RecordsHandler, 'log_message', lambda *args: None)
+    service = RecordsService(('127.0.0.1', 0), str(tmp_path / 'records.db'))
+    thread = threading.Thread(target=service.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{service.server_port}'
+    service.shutdown()
+    service.server_close()
+
+
+@pytest.mark.parametrize('call', [
+    lambda client: client.first_page(10),
+    lambda client: client.add_record(NEW_RECORD),
+    lambda client: client.update_record(1, 1, NEW_RECORD),
+    lambda client: client.delete_record(1, 1),
+    lambda client: client.download('POST', '/export', body={'name': 'all', 'format': 'csv'}),
+    lambda client: client.request('POST', '/import', {'name': 'records.csv'}, data=b'targa\n'),
+])
+def test_requests_without_a_session_are_refused(service, call):
+    with pytest.raises(ServiceError) as error:
+        call(ServiceClient(service))
+    assert error.value.status == 401
+
+
+def test_login_opens_a_session(service):
+    client = ServiceClient(service)
+    assert not client.login('b2b', 'wrong')
+    assert client.token is None
+
+    assert client.login('b2b', '0000v')
+    record_id = client.add_record(NEW_RECORD)
+    record = client.for_update(record_id)
+    assert client.delete_record(record_id, record['version'])
+
+    client.token = 'not-a-session'
+    with pytest.raises(ServiceError) as error:
+        client.first_page(10)
+    assert error.value.status == 401
+
+
+def test_stato_report_leaves_no_file_on_the_service(service, tmp_path, monkeypatch):
+    service_dir = tmp_path / 'service'
+    service_dir.mkdir()
+    monkeypatch.chdir(service_dir)
+    client = ServiceClient(service)
+    assert client.login('b2b', '0000v')
+    client.add_record(NEW_RECORD)
+
+    headers, file_path = client.download('POST', '/reports/stato', str(tmp_path / 'report.xlsx'),
+                                         body={'flotta': 'ALD'})
+    folder, name = headers['X-File-Name'].split('/')
+    assert folder.startswith('ALD_') and name.startswith('ALD ') and name.endswith('.xlsx')
+    assert os.path.getsize(file_path) > 0
+    assert os.listdir(service_dir) == []
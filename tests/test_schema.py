@@ -0,0 +1,125 @@
+# tests/test_schema.py
+# Migrations of the shipped database, and the trigger-maintained records_aging and
+# records_counts tables.
+import sqlite3
+
+import numpy as np
+import pytest
+
+from db_connections import connect
+from db_schema import DATE_COLUMNS, MIGRATIONS, ensure_schema, ordinal_column
+from records_counts import verify_counts
+from records_store import delete_if_unchanged, import_file, insert_record, update_if_unchanged
+from working_days import parse_date, working_days_since
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def table_names(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def version_of(conn, record_id):
+    return conn.execute('SELECT version FROM records WHERE id = ?', (record_id,)).fetchone()[0]
+
+
+def assert_ages_match(conn):
+    """Every open record is aged in records_aging, as working_days_since counts it."""
+    rows = conn.execute('''
+        SELECT records.data_incarico, records_aging.working_days
+        FROM records LEFT JOIN records_aging ON records_aging.record_id = records.id
+        WHERE records.stato != 'Consegnata'
+    ''').fetchall()
+    assert rows
+    ages = working_days_since([row[0] for row in rows])
+    assert [row[1] for row in rows] == ages.tolist()
+
+
+def test_ensure_schema_migrates_the_baseline(baseline_path):
+    with sqlite3.connect(baseline_path) as plain:
+        assert plain.execute('PRAGMA user_version').fetchone()[0] == 0
+        records = plain.execute('SELECT COUNT(*) FROM records').fetchone()[0]
+
+    conn = connect(baseline_path)
+    try:
+        ensure_schema(conn)
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == LATEST_VERSION
+        assert conn.execute('SELECT COUNT(*) FROM records').fetchone()[0] == records
+        assert {'records_aging', 'records_counts', 'business_calendar'} <= table_names(conn)
+
+        # Every valid date got its day ordinal
+        for column in DATE_COLUMNS:
+            for value, day in conn.execute(f'SELECT {column}, {ordinal_column(column)} FROM records'):
+                parsed = parse_date(value)
+                assert day == (None if np.isnat(parsed) else parsed.astype(object).toordinal())
+
+        # Every record has its derived fields, and is still at version 1: filling them in is not an edit
+        assert conn.execute('SELECT COUNT(*) FROM records WHERE version IS NOT 1').fetchone()[0] == 0
+        assert conn.execute(
+            'SELECT COUNT(*) FROM records WHERE gg_entrata_data_incarico IS NULL'
+        ).fetchone()[0] == 0
+        assert verify_counts(conn) == []
+        assert_ages_match(conn)
+
+        # A second run has nothing left to do
+        ensure_schema(conn)
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == LATEST_VERSION
+    finally:
+        conn.close()
+
+
+def test_aging_follows_inserts_updates_and_deletes(conn):
+    first = insert_record(conn, ('ALD', 'AB123CD', 'PANDA', '01/10/2024', '02/10/2024', 'Attesa Perizia', 1, None))
+    second = insert_record(conn, ('CSN', 'CD456EF', 'PUMA', '01/10/2024', '03/10/2024', 'Pronta', 2, None))
+    conn.commit()
+    assert_ages_match(conn)
+
+    # Delivered records are not aged
+    assert update_if_unchanged(conn, second, version_of(conn, second),
+                               ('', '', '', '', '', 0, 'Consegnata', '', None, None, None, None, None, '04/10/2024'))
+    conn.commit()
+    assert [row[0] for row in conn.execute('SELECT record_id FROM records_aging')] == [first]
+    assert_ages_match(conn)
+
+    assert delete_if_unchanged(conn, first, version_of(conn, first))
+    conn.commit()
+    assert conn.execute('SELECT COUNT(*) FROM records_aging').fetchone()[0] == 0
+
+
+def test_counts_follow_every_write(conn, tmp_path):
+    record_id = insert_record(conn, ('ALD', 'AB123CD', 'PANDA', '01/10/2024', '02/10/2024', 'Attesa Perizia', 1, None))
+    insert_record(conn, ('CSN', 'CD456EF', 'PUMA', '01/10/2024', '03/10/2024', 'Pronta', 2, None))
+    conn.commit()
+    assert verify_counts(conn) == []
+
+    assert update_if_unchanged(conn, record_id, version_of(conn, record_id),
+                               ('HPS', '', '', '', '', 0, 'Lavorazione Carr.', '', None, None, None, None, None, None))
+    conn.commit()
+    assert verify_counts(conn) == []
+
+    assert delete_if_unchanged(conn, record_id, version_of(conn, record_id))
+    conn.commit()
+    assert verify_counts(conn) == []
+
+    csv_path = tmp_path / 'import.csv'
+    csv_path.write_text(
+        'flotta,targa,modello,entrata,data_incarico,ditta,stato\n'
+        'ALD,EF789GH,PANDA,2024-10-01,02/10/2024,PIBO,Attesa Ricambi\n'
+        'LEASYS,GH012JK,COMPASS,01/10/2024,01/10/2024,,Consegnata\n'
+        'ALD,JK345LM,PUMA,30/09/2024,01/10/2024,HPS,Lavorazione Carr.\n',
+        encoding='utf-8',
+    )
+    result = import_file(conn, str(csv_path))
+    assert result['imported'] == 3
+    assert verify_counts(conn) == []
+    assert_ages_match(conn)
+
+
+@pytest.mark.parametrize('column', ['flotta', 'stato', 'ditta'])
+def test_counts_follow_a_bulk_update(conn, column):
+    for number in range(5):
+        insert_record(conn, ('ALD', f'AB{number:03d}CD', 'PANDA', '01/10/2024', '02/10/2024', 'Pronta', 1, None))
+    conn.commit()
+    conn.execute(f"UPDATE records SET {column} = 'X' WHERE id % 2 = 0")
+    conn.commit()
+    assert verify_counts(conn) == []
@@ -0,0 +1,26 @@
+# users.py
+# Login accounts, stored in the users table next to the records.
+import bcrypt
+
+
+def ensure_users_table(conn):
+    """Create the users table with the default account if it does not exist yet."""
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password BLOB
+        )
+    ''')
+    conn.commit()
+
+    cursor.execute("SELECT * FROM users WHERE username = ?", ('b2b',))
+    if not cursor.fetchone():
+        hashed_password = bcrypt.hashpw('0000v'.encode('utf-8'), bcrypt.gensalt())
+        cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", ('b2b', hashed_password))
+        conn.commit()
+
+
+def check_login(conn, username, password):
+    result = conn.execute("SELECT password FROM users WHERE username=?", (username,)).fetchone()
+    return bool(result) and bcrypt.checkpw(password.encode('utf-8'), result[0])
@@ -0,0 +1,189 @@
+# working_days.py
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+import numpy as np
+
+DATE_FORMAT = '%d/%m/%Y'
+ISO_DATE_FORMAT = '%Y-%m-%d'  # dates imported before they were normalized to dd/mm/yyyy
+WEEKMASK = '1111100'  # Monday to Friday
+
+# Italian public holidays as (month, day); Easter Monday is added for every year. Workshop
+# closures and the patron saint are kept in the database instead (see business_calendar.py)
+HOLIDAYS = [
+    (1, 1),    # Capodanno
+    (1, 6),    # Epifania
+    (4, 25),   # Festa della Liberazione
+    (5, 1),    # Festa dei Lavoratori
+    (6, 2),    # Festa della Repubblica
+    (8, 15),   # Ferragosto
+    (11, 1),   # Ognissanti
+    (12, 8),   # Immacolata Concezione
+    (12, 25),  # Natale
+    (12, 26),  # Santo Stefano
+]
+
+# Years the holidays are laid out for, here and in the business_calendar table
+CALENDAR_FIRST_YEAR = 2000
+CALENDAR_YEARS_AHEAD = 2
+
+NAT = np.datetime64('NaT', 'D')
+
+
+def easter_sunday(year):
+    """Date of Easter Sunday in the Gregorian calendar (anonymous Gregorian algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month, day = divmod(h + l - 7 * m + 90, 25)
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+
+def public_holidays(first_year, last_year):
+    """The HOLIDAYS and Easter Mondays of the years first_year to last_year, as dates."""
+    holidays = []
+    for year in range(first_year, last_year + 1):
+        holidays.extend(date(year, month, day) for month, day in HOLIDAYS)
+        holidays.append(easter_sunday(year) + timedelta(days=1))
+    return holidays
+
+
+class BusinessDays:
+    def __init__(self, days_off):
+        """Working days: Monday to Friday, except the dates in days_off."""
+        self.set_days_off(days_off)
+
+    def set_days_off(self, days_off):
+        self.calendar = np.busdaycalendar(weekmask=WEEKMASK,
+                                          holidays=np.array(sorted(days_off), dtype='datetime64[D]'))
+
+
+# The public holidays until business_calendar.ensure_calendar adds the closures of the database
+business_days = BusinessDays(public_holidays(CALENDAR_FIRST_YEAR, date.today().year + CALENDAR_YEARS_AHEAD))
+
+
+@lru_cache(maxsize=65536)
+def parse_date(date_str):
+    """Parse a 'dd/mm/yyyy' (or legacy 'yyyy-mm-dd') string into a datetime64[D], NaT if empty or invalid."""
+    if not date_str or not isinstance(date_str, str):
+        return NAT
+    date_str = date_str.strip()
+    for date_format in (DATE_FORMAT, ISO_DATE_FORMAT):
+        try:
+            return np.datetime64(datetime.strptime(date_str[:10], date_format).date(), 'D')
+        except ValueError:
+            continue
+    return NAT
+
+
+def to_datetime64(values):
+    """Convert a column of dates (strings, date/datetime objects) into a datetime64[D] array.
+
+    Every distinct string is parsed only once: the column is reduced to its unique
+    values first and those go through the parse_date cache.
+    """
+    if isinstance(values, np.ndarray) and np.issubdtype(values.dtype, np.datetime64):
+        return values.astype('datetime64[D]')
+    if isinstance(values, (str, date)) or values is None:
+        values = [values]
+    values = list(values)
+    if not values:
+        return np.array([], dtype='datetime64[D]')
+    if all(isinstance(value, str) or value is None for value in values):
+        strings = np.array([value or '' for value in values], dtype=str)
+        unique, inverse = np.unique(strings, return_inverse=True)
+        parsed = np.array([parse_date(value) for value in unique], dtype='datetime64[D]')
+        return parsed[inverse.reshape(-1)]
+    return np.array([_to_day(value) for value in values], dtype='datetime64[D]')
+
+
+def _to_day(value):
+    if isinstance(value, datetime):
+        return np.datetime64(value.date(), 'D')
+    if isinstance(value, date):
+        return np.datetime64(value, 'D')
+    if isinstance(value, np.datetime64):
+        return value.astype('datetime64[D]')
+    return parse_date(value)
+
+
+def count_working_days(start_dates, end_dates):
+    """Count working days (see business_days) between start and end, both included, element-wise.
+
+    Either argument may be a single date or a column of dates. Invalid or missing
+    dates, and start dates after the end date, count as 0 working days.
+    """
+    start = to_datetime64(start_dates)
+    end = to_datetime64(end_dates)
+    start, end = np.broadcast_arrays(start, end)
+    counts = np.zeros(start.shape, dtype=np.int64)
+    valid = ~(np.isnat(start) | np.isnat(end))
+    valid[valid] = start[valid] <= end[valid]
+    if valid.any():
+        counts[valid] = np.busday_count(start[valid], end[valid] + np.timedelta64(1, 'D'),
+                                        busdaycal=business_days.calendar)
+    return counts
+
+
+def working_days_since(start_dates, today=None):
+    """Working days elapsed from each start date up to today (included)."""
+    return count_working_days(start_dates, today or date.today())
+
+
+def latest_start_with_working_days(min_days, today=None):
+    """Latest start date whose working-day count up to today (included) is still at least min_days.
+
+    Lets an "older than N working days" filter become a plain date comparison.
+    """
+    today = np.datetime64(today or date.today(), 'D')
+    return np.busday_offset(today, -(min_days - 1), roll='backward', busdaycal=business_days.calendar).astype(date)
+
+
+def calculate_working_days(start_date_str, end_date_str):
+    """Scalar version of count_working_days for a single pair of 'dd/mm/yyyy' strings."""
+    if not start_date_str or not end_date_str:
+        return 0
+    return int(count_working_days([start_date_str], [end_date_str])[0])
+
+
+def add_working_days(start_date_str, days_to_add):
+    """Return the 'dd/mm/yyyy' date falling days_to_add working days after start, None if invalid."""
+    start = parse_date(start_date_str)
+    if np.isnat(start):
+        return None
+    if days_to_add <= 0:
+        result = start
+    else:
+        # Rolling backward makes a weekend or holiday start count from the previous working
+        # day, so the first working day after it is the next one.
+        result = np.busday_offset(start, days_to_add, roll='backward', busdaycal=business_days.calendar)
+    return result.astype(date).strftime(DATE_FORMAT)
+
+
+# Upper bounds of the legend buckets: up to 10 working days no color, 11-15 yellow, 16-20 orange, over 20 red
+AGING_THRESHOLDS = [10, 15, 20]
+AGING_COLORS = np.array(['', 'yellow', 'orange', 'red'])
+
+
+def aging_buckets(working_days):
+    """Legend bucket of each age: 0 (no color) to 3 (red), as indexes into AGING_COLORS."""
+    return np.digitize(np.asarray(working_days), AGING_THRESHOLDS, right=True)
+
+
+def aging_colors(working_days):
+    """Map working-day ages to the legend colors: 10-15 yellow, 16-20 orange, over 20 red."""
+    return AGING_COLORS[aging_buckets(working_days)]
+
+
+def bucket_counts(buckets):
+    """How many of the aging buckets fall in each colored one, as a {'yellow': n, 'orange': n, 'red': n} dict."""
+    counts = np.bincount(np.asarray(buckets, dtype=np.int64).ravel(), minlength=len(AGING_COLORS))
+    return {str(color): int(count) for color, count in zip(AGING_COLORS[1:], counts[1:])}
+
+
+def aging_counts(working_days):
+    """How many ages fall in each legend bucket, as a {'yellow': n, 'orange': n, 'red': n} dict."""
+    return bucket_counts(aging_buckets(working_days))